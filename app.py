@@ -3,9 +3,18 @@ Microbe Insights - Flask Application
 Complete microscopy analysis platform with AI-powered microplastic and plankton detection
 """
 
-from flask import Flask, render_template, request, jsonify, send_from_directory, Response, make_response, redirect, url_for, flash
 import os
+
+# Cooperative sockets for MJPEG streaming; must run before anything else is imported
+if os.environ.get('GEVENT'):
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, make_response, redirect, url_for, flash, abort
+from werkzeug.utils import safe_join
 import sys
+import mimetypes
+import importlib
 from datetime import datetime
 import sqlite3
 import json
@@ -13,19 +22,45 @@ import json
 # Add the app directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
-from services.database import init_database, get_recent_reports, get_report_by_id, create_report
-from services.camera import camera_manager
+from services.database import get_recent_reports, get_report_by_id, create_report
+from services.camera import camera_manager, frame_broadcaster, save_snapshot
+from services.json_provider import init_json_provider
+
+# Route modules under routes/, each exposing a blueprint named bp
+BLUEPRINTS = ('home', 'capture', 'chat', 'reports', 'results', 'analytics', 'settings', 'help')
+
+# MJPEG multipart part header, built once instead of per frame
+_HDR = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+def _enabled_blueprints(names=None):
+    """Route modules to register: names, else ENABLED_BLUEPRINTS (comma-separated), else all"""
+    if names is None:
+        names = [name.strip() for name in os.environ.get('ENABLED_BLUEPRINTS', '').split(',') if name.strip()]
+        names = names or BLUEPRINTS
+    unknown = [name for name in names if name not in BLUEPRINTS]
+    if unknown:
+        raise ValueError(f"Unknown blueprints {', '.join(unknown)}; choose from {', '.join(BLUEPRINTS)}")
+    return tuple(names)
 
-def create_app():
-    """Create and configure the Flask application"""
+def create_app(enabled_blueprints=None):
+    """Create and configure the Flask application; enabled_blueprints limits the registered route modules"""
     app = Flask(__name__)
     app.secret_key = 'microbe_insights_secret_key_2024'
+    init_json_provider(app)
     
     # Configuration
     app.config['UPLOAD_FOLDER'] = 'data/uploads'
     app.config['CAPTURE_FOLDER'] = 'data/captures'
     app.config['RESULTS_FOLDER'] = 'data/results'
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    app.config['STREAM_JPEG_QUALITY'] = 80  # MJPEG live feed quality
+    app.config['STREAM_MAX_CLIENTS'] = 16  # Concurrent live feed viewers
+    app.config['STREAM_GPU_ENCODE'] = True  # Encode the live feed with nvJPEG when CUDA is present
+    app.config['ENABLED_BLUEPRINTS'] = _enabled_blueprints(enabled_blueprints)
+    # Behind Apache/mod_xsendfile set USE_X_SENDFILE=1; behind nginx set X_ACCEL_REDIRECT_PREFIX
+    # to an internal location that maps <prefix>/uploads|captures|results to the data folders
+    app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+    app.config['X_ACCEL_REDIRECT_PREFIX'] = os.environ.get('X_ACCEL_REDIRECT_PREFIX', '').rstrip('/')
     
     # Ensure directories exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -33,60 +68,58 @@ def create_app():
     os.makedirs(app.config['RESULTS_FOLDER'], exist_ok=True)
     os.makedirs('data', exist_ok=True)
     
-    # Initialize database
-    init_database()
-    
-    # Register blueprints
-    from routes.home import bp as home_bp
-    from routes.capture import bp as capture_bp
-    from routes.chat import bp as chat_bp
-    from routes.reports import bp as reports_bp
-    from routes.results import bp as results_bp
-    from routes.analytics import bp as analytics_bp
-    from routes.settings import bp as settings_bp
-    from routes.help import bp as help_bp
-    
-    app.register_blueprint(home_bp)
-    app.register_blueprint(capture_bp)
-    app.register_blueprint(chat_bp)
-    app.register_blueprint(reports_bp)
-    app.register_blueprint(results_bp)
-    app.register_blueprint(analytics_bp)
-    app.register_blueprint(settings_bp)
-    app.register_blueprint(help_bp)
+    frame_broadcaster.quality = app.config['STREAM_JPEG_QUALITY']
+    frame_broadcaster.max_clients = app.config['STREAM_MAX_CLIENTS']
+    frame_broadcaster.use_gpu_encoder = app.config['STREAM_GPU_ENCODE']
+    
+    # The database schema is created on the first pooled connection rather than here,
+    # so a preloading gunicorn master never opens SQLite before forking workers
+    
+    # Register blueprints; only enabled route modules are imported
+    for name in app.config['ENABLED_BLUEPRINTS']:
+        app.register_blueprint(importlib.import_module(f'routes.{name}').bp)
     
     # Static file routes
+    def send_data_file(folder_key, url_dir, filename):
+        """Serve a data file, letting the front-end server copy the bytes when configured"""
+        prefix = app.config['X_ACCEL_REDIRECT_PREFIX']
+        if prefix:
+            path = safe_join(app.config[folder_key], filename)
+            if path is None or not os.path.isfile(path):
+                abort(404)
+            response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = f'{prefix}/{url_dir}/{filename}'
+            return response
+        
+        # Revalidation returns 304 without a body; the body itself goes out via wsgi.file_wrapper (sendfile)
+        return send_from_directory(app.config[folder_key], filename, conditional=True, etag=True)
+    
     @app.route('/uploads/<filename>')
     def uploaded_file(filename):
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        return send_data_file('UPLOAD_FOLDER', 'uploads', filename)
     
     @app.route('/captures/<filename>')
     def captured_file(filename):
-        return send_from_directory(app.config['CAPTURE_FOLDER'], filename)
+        return send_data_file('CAPTURE_FOLDER', 'captures', filename)
     
     @app.route('/results/<filename>')
     def result_file(filename):
-        return send_from_directory(app.config['RESULTS_FOLDER'], filename)
+        return send_data_file('RESULTS_FOLDER', 'results', filename)
     
     # Video feed route for persistent camera
     @app.route('/video_feed')
     def video_feed():
         """Live camera feed endpoint"""
+        if not frame_broadcaster.open_client():
+            return jsonify({'error': 'Too many live feed clients'}), 503
+        
         def generate_frames():
-            while True:
-                frame = camera_manager.get_active_frame()
-                if frame is not None:
-                    import cv2
-                    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                    if ret:
-                        frame_bytes = buffer.tobytes()
-                        yield (b'--frame\r\n'
-                               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                else:
-                    import time
-                    time.sleep(0.1)
+            for frame_bytes in frame_broadcaster.frames():
+                yield _HDR + frame_bytes + b'\r\n'
         
-        return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+        response = Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+        response.call_on_close(frame_broadcaster.close_client)
+        return response
     
     # Camera control routes
     @app.route('/camera/start', methods=['POST'])
@@ -146,12 +179,11 @@ def create_app():
         try:
             frame = camera_manager.capture_snapshot()
             if frame is not None:
-                import cv2
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"snapshot_{timestamp}.jpg"
                 filepath = os.path.join(app.config['CAPTURE_FOLDER'], filename)
                 
-                cv2.imwrite(filepath, frame)
+                save_snapshot(frame, filepath)
                 
                 return jsonify({
                     'success': True,
@@ -177,4 +209,4 @@ def create_app():
 
 if __name__ == '__main__':
     app = create_app()
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
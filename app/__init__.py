@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, request
 from flask_cors import CORS
 import os
 
@@ -20,4 +20,13 @@ def create_app():
     from app.routes import bp
     app.register_blueprint(bp)
     
+    @app.before_request
+    def wait_for_model_warmup():
+        # main.py loads the models in the background; analysis requests wait for it
+        # once, after which the future is dropped and this is a dict lookup
+        warmup = app.config.get('MODEL_WARMUP')
+        if warmup is not None and request.method == 'POST':
+            warmup.result()
+            app.config.pop('MODEL_WARMUP', None)
+    
     return app
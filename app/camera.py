@@ -12,6 +12,24 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# libjpeg-turbo encoder (SIMD colour conversion + DCT); falls back to OpenCV
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_420
+    _tj = TurboJPEG()
+except (ImportError, OSError) as e:  # OSError: libturbojpeg shared library missing
+    logger.warning(f"TurboJPEG unavailable, using OpenCV JPEG encoder: {e}")
+    _tj = None
+
+def encode_jpeg(frame: np.ndarray, quality: int = 80) -> Optional[bytes]:
+    """Encode a BGR frame as baseline JPEG (4:2:0, no optimized Huffman pass)"""
+    if _tj is not None:
+        return _tj.encode(frame, quality=quality, jpeg_subsample=TJSAMP_420, flags=0)
+    
+    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality,
+                                               cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+                                               cv2.IMWRITE_JPEG_PROGRESSIVE, 0])
+    return buffer.tobytes() if ret else None
+
 class GStreamerCamera:
     """GStreamer-based camera interface with real-time capture capabilities"""
     
@@ -210,9 +228,17 @@ class GStreamerCamera:
 class CameraManager:
     """Manager for multiple camera instances"""
     
-    def __init__(self):
+    def __init__(self, stream_quality: int = 80):
         self.cameras = {}
         self.active_camera_id = None
+        
+        # Live stream: the active camera's frames are JPEG-encoded once, on its capture
+        # thread, and the same bytes object is handed to every connected client
+        self.stream_quality = stream_quality
+        self.stream_clients = 0
+        self._latest_jpeg = None
+        self._jpeg_seq = 0
+        self._cv = threading.Condition()
     
     def add_camera(self, 
                    camera_id: int,
@@ -230,6 +256,7 @@ class CameraManager:
                 camera_type=camera_type
             )
             
+            camera.set_frame_callback(lambda frame, cid=camera_id: self._on_frame(cid, frame))
             self.cameras[camera_id] = camera
             
             # Set as active if it's the first camera
@@ -280,6 +307,36 @@ class CameraManager:
             return self.cameras[camera_id].capture_snapshot()
         return None
     
+    def _on_frame(self, camera_id: int, frame: np.ndarray):
+        """Capture-thread callback: encode the active camera's frame while anyone is watching"""
+        if self.stream_clients == 0 or camera_id != self.active_camera_id:
+            return
+        
+        jpeg = encode_jpeg(frame, self.stream_quality)
+        if jpeg is not None:
+            with self._cv:
+                self._latest_jpeg = jpeg
+                self._jpeg_seq += 1
+                self._cv.notify_all()
+    
+    def jpeg_frames(self):
+        """Yield each new JPEG of the active camera once; a slow client skips to the newest frame"""
+        with self._cv:
+            self.stream_clients += 1
+        
+        try:
+            last_seq = -1
+            while True:
+                with self._cv:
+                    if not self._cv.wait_for(lambda: self._jpeg_seq != last_seq, timeout=1.0):
+                        continue
+                    jpeg = self._latest_jpeg
+                    last_seq = self._jpeg_seq
+                yield jpeg
+        finally:
+            with self._cv:
+                self.stream_clients -= 1
+    
     def get_camera_list(self) -> list:
         """Get list of available cameras"""
         return list(self.cameras.keys())
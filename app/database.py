@@ -0,0 +1,291 @@
+"""
+Results database for the dashboard API
+Stores microplastic and plankton predictions in SQLite; inserts are queued and
+written by a single background thread in batched transactions
+"""
+
+import sqlite3
+import json
+import queue
+import threading
+import time
+import atexit
+import logging
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# orjson encodes lists and numpy arrays in C; kept as TEXT so SQLite's JSON1 functions still apply
+try:
+    import orjson
+    
+    def dumps_json(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    
+    loads_json = orjson.loads
+except ImportError:
+    dumps_json = json.dumps
+    loads_json = json.loads
+
+DATABASE_PATH = 'results/database.db'
+
+# Writer batching: flush after BATCH_SIZE rows or FLUSH_INTERVAL seconds, whichever comes first
+BATCH_SIZE = 1000
+FLUSH_INTERVAL = 0.1
+
+INSERT_MICROPLASTIC = '''
+    INSERT INTO microplastic_results (timestamp, image_path, detections, image_shape)
+    VALUES (?, ?, ?, ?)
+'''
+
+INSERT_PLANKTON = '''
+    INSERT INTO plankton_results (timestamp, image_path, species_name, confidence, mask_data, image_shape)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+INCREMENT_CLASS_COUNT = '''
+    INSERT INTO class_counts (class_name, n) VALUES (?, ?)
+    ON CONFLICT(class_name) DO UPDATE SET n = n + excluded.n
+'''
+
+# Per-class detection counts computed inside SQLite with json_each; detections are
+# stored either as a bare list or as {"detections": [...]}
+COUNT_CLASSES_FROM_ROWS = '''
+    SELECT json_extract(d.value, '$.class_name') AS class_name, COUNT(*)
+    FROM microplastic_results AS r,
+         json_each(COALESCE(json_extract(r.detections, '$.detections'), r.detections)) AS d
+    WHERE json_valid(r.detections)
+      AND json_extract(d.value, '$.class_name') IS NOT NULL
+    GROUP BY class_name
+'''
+
+# Microplastic classes reported by /api/stats
+MICROPLASTIC_CLASSES = ('fiber', 'fragment', 'pellet', 'film')
+
+_write_queue = queue.Queue()
+_writer_thread = None
+_writer_lock = threading.Lock()
+
+# Dashboards poll /api/stats every few seconds; reuse a result for up to STATS_TTL
+# seconds unless the writer has committed rows since it was computed
+STATS_TTL = 3.0
+_stats_cache = None  # (computed_at, write_generation, stats)
+_write_generation = 0
+
+# One shared read connection; WAL lets it read while the writer thread commits
+_read_conn = None
+_read_lock = threading.Lock()
+
+def _connect():
+    """Open a connection in autocommit mode with WAL so readers never block the writer"""
+    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+def init_db():
+    """Initialize SQLite database for storing results"""
+    conn = _connect()
+    cursor = conn.cursor()
+    
+    # Create tables
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS microplastic_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            image_path TEXT,
+            detections TEXT,
+            image_shape TEXT
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS plankton_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            image_path TEXT,
+            species_name TEXT,
+            confidence REAL,
+            mask_data TEXT,
+            image_shape TEXT
+        )
+    ''')
+    
+    # Running per-class detection totals, maintained by the writer thread
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS class_counts (
+            class_name TEXT PRIMARY KEY,
+            n INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    backfill = cursor.execute('SELECT 1 FROM class_counts LIMIT 1').fetchone() is None
+    conn.close()
+    
+    # Backfill the totals from rows written before the table existed
+    if backfill:
+        rebuild_class_counts()
+
+def rebuild_class_counts():
+    """Recompute class_counts from the stored detections; init_db uses it to backfill older databases"""
+    flush()
+    conn = _connect()
+    try:
+        conn.execute('BEGIN')
+        conn.execute('DELETE FROM class_counts')
+        conn.execute(f'INSERT INTO class_counts (class_name, n) {COUNT_CLASSES_FROM_ROWS}')
+        conn.execute('COMMIT')
+    finally:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        conn.close()
+
+def _read_connection():
+    """Return the shared read connection, opening it on first use"""
+    global _read_conn
+    if _read_conn is None:
+        _read_conn = _connect()
+    return _read_conn
+
+def _write_batch(conn, batch):
+    """Insert a batch of (sql, row) items in one transaction, one executemany per statement"""
+    grouped = {}
+    for sql, row in batch:
+        grouped.setdefault(sql, []).append(row)
+    
+    global _write_generation
+    try:
+        conn.execute('BEGIN')
+        for sql, rows in grouped.items():
+            conn.executemany(sql, rows)
+        conn.execute('COMMIT')
+        _write_generation += 1  # invalidates the cached stats
+    except sqlite3.Error as e:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        logger.error(f"Failed to write {len(batch)} result rows: {e}")
+
+def _drain():
+    """Writer thread: collect queued rows and flush them in batches"""
+    conn = _connect()
+    while True:
+        batch = [_write_queue.get()]
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        
+        while len(batch) < BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_write_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        
+        _write_batch(conn, batch)
+        for _ in batch:
+            _write_queue.task_done()
+
+def _enqueue(sql, row):
+    """Queue a row for the writer thread, starting it on first use"""
+    global _writer_thread
+    if _writer_thread is None:
+        with _writer_lock:
+            if _writer_thread is None:
+                _writer_thread = threading.Thread(target=_drain, daemon=True)
+                _writer_thread.start()
+    _write_queue.put((sql, row))
+
+def flush():
+    """Block until every queued row has been written"""
+    if _writer_thread is not None:
+        _write_queue.join()
+
+atexit.register(flush)
+
+def reset_after_fork():
+    """Forget the parent's writer thread, queue and read connection in a forked worker"""
+    global _write_queue, _writer_thread, _writer_lock, _read_conn, _read_lock
+    _write_queue = queue.Queue()
+    _writer_thread = None
+    _writer_lock = threading.Lock()
+    _read_conn = None
+    _read_lock = threading.Lock()
+
+def save_microplastic_result(image_path, detections, image_shape, timestamp=None):
+    """Queue a microplastic detection result and its per-class counts for the database"""
+    _enqueue(INSERT_MICROPLASTIC, (timestamp or datetime.now().isoformat(), image_path,
+                                   dumps_json(detections), dumps_json(image_shape)))
+    
+    items = detections.get('detections', []) if isinstance(detections, dict) else detections
+    counts = Counter(detection.get('class_name') for detection in items)
+    for class_name, n in counts.items():
+        if class_name:
+            _enqueue(INCREMENT_CLASS_COUNT, (class_name, n))
+
+def save_plankton_result(image_path, species_name, confidence, mask_data, image_shape, timestamp=None):
+    """Queue a plankton analysis result for the database"""
+    _enqueue(INSERT_PLANKTON, (timestamp or datetime.now().isoformat(), image_path, species_name,
+                               confidence, dumps_json(mask_data), dumps_json(image_shape)))
+
+def get_recent_results(limit=50):
+    """Get recent results from database"""
+    with _read_lock:
+        cursor = _read_connection().cursor()
+        
+        # Newest first by rowid: ids are assigned in insert order, so this is a backwards
+        # walk of the table B-tree that stops after LIMIT rows instead of a full sort
+        cursor.execute('''
+            SELECT timestamp, image_path, detections 
+            FROM microplastic_results 
+            ORDER BY id DESC 
+            LIMIT ?
+        ''', (limit,))
+        microplastic_results = cursor.fetchall()
+        
+        # Only the columns the data dashboard renders
+        cursor.execute('''
+            SELECT timestamp, image_path, species_name, confidence 
+            FROM plankton_results 
+            ORDER BY id DESC 
+            LIMIT ?
+        ''', (limit,))
+        plankton_results = cursor.fetchall()
+    
+    return microplastic_results, plankton_results
+
+def get_stats_data():
+    """Get result counts, species distribution and microplastic class totals"""
+    global _stats_cache
+    cached = _stats_cache
+    if (cached is not None and cached[1] == _write_generation
+            and time.monotonic() - cached[0] < STATS_TTL):
+        return cached[2]
+    
+    # Read the generation first: a commit landing mid-query then just makes the entry stale
+    generation = _write_generation
+    with _read_lock:
+        cursor = _read_connection().cursor()
+        
+        cursor.execute('SELECT COUNT(*) FROM microplastic_results')
+        microplastic_count = cursor.fetchone()[0]
+        
+        cursor.execute('SELECT COUNT(*) FROM plankton_results')
+        plankton_count = cursor.fetchone()[0]
+        
+        cursor.execute('SELECT species_name, COUNT(*) FROM plankton_results GROUP BY species_name ORDER BY COUNT(*) DESC')
+        species_dist = cursor.fetchall()
+        
+        # O(#classes) instead of re-parsing every detections row
+        class_counts = dict.fromkeys(MICROPLASTIC_CLASSES, 0)
+        cursor.execute('SELECT class_name, n FROM class_counts')
+        class_counts.update((name, n) for name, n in cursor if name in class_counts)
+    
+    stats = {
+        'microplastic_count': microplastic_count,
+        'plankton_count': plankton_count,
+        'species_distribution': dict(species_dist),
+        'microplastic_distribution': class_counts
+    }
+    _stats_cache = (time.monotonic(), generation, stats)
+    return stats
@@ -0,0 +1,135 @@
+"""
+Inference worker pool
+Runs model prediction and visualization in separate processes so CPU-bound
+PyTorch/OpenCV work never holds the GIL of the HTTP server process
+"""
+
+import os
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+MAX_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+# Seconds a request waits for its prediction before giving up
+INFERENCE_TIMEOUT = 30
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Submitted background jobs by id, removed once their result is collected
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def _load_models():
+    """Worker initializer: build both models once per process"""
+    import torch
+    from app.models.microplastic_model import get_microplastic_model
+    from app.models.plankton_model import get_plankton_model
+    
+    # Split the cores between workers instead of every worker using all of them
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // MAX_WORKERS))
+    get_microplastic_model()
+    get_plankton_model()
+
+def run_microplastic(image, vis_path=None):
+    """Detect microplastics in an image path or BGR frame and optionally draw the detections to vis_path"""
+    from app.models.microplastic_model import get_microplastic_model
+    model = get_microplastic_model()
+    
+    result = model.predict(image) if isinstance(image, str) else model.predict_array(image)
+    image = result.pop('image', None)  # ndarray stays in the worker
+    if result['success'] and vis_path:
+        model.draw_detections(image, result, vis_path)
+    return result
+
+def run_plankton(image, vis_path=None, full_probabilities=False):
+    """Segment and classify plankton in an image path or BGR frame and optionally save the overlay to vis_path"""
+    from app.models.plankton_model import get_plankton_model
+    model = get_plankton_model()
+    
+    if isinstance(image, str):
+        result = model.predict(image, full_probabilities)
+    else:
+        result = model.predict_array(image, full_probabilities)
+    image, mask = result.pop('image', None), result.pop('mask', None)  # arrays stay in the worker
+    if result['success'] and vis_path:
+        model.save_visualization(image, mask, result['classification'], vis_path)
+    return result
+
+def get_executor():
+    """Return the process pool, starting it on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: the server process holds threads (DB writer, cameras) and possibly CUDA state
+                _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'),
+                                                initializer=_load_models)
+    return _executor
+
+def _discard_executor(broken):
+    """Forget a broken pool so the next get_executor starts a fresh one"""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def _submit(fn, *args):
+    """Submit to the pool and return (executor, future), restarting the pool once if it is broken"""
+    executor = get_executor()
+    try:
+        return executor, executor.submit(fn, *args)
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        executor = get_executor()
+        return executor, executor.submit(fn, *args)
+
+def reset_after_fork():
+    """Drop the parent's pool and jobs in a forked worker; the pool restarts on first use"""
+    global _executor, _executor_lock, _jobs, _jobs_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+    _jobs = {}
+    _jobs_lock = threading.Lock()
+
+def run(fn, *args):
+    """Run fn in the pool and wait up to INFERENCE_TIMEOUT seconds for its result"""
+    for attempt in range(2):
+        executor, future = _submit(fn, *args)
+        try:
+            return future.result(timeout=INFERENCE_TIMEOUT)
+        except BrokenProcessPool:
+            # A worker died mid-job (e.g. OOM kill); retry once on a fresh pool
+            _discard_executor(executor)
+            if attempt:
+                raise
+        except FuturesTimeoutError:
+            raise Exception(f"Inference did not finish within {INFERENCE_TIMEOUT} seconds")
+
+def submit_job(fn, args, info=None):
+    """Start fn(*args) in the pool and return a job id for get_job; info is handed back with the result"""
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        _jobs[job_id] = (*_submit(fn, *args), info)
+    return job_id
+
+def get_job(job_id):
+    """Return (found, done, result, info) for a job; a finished job is forgotten once returned"""
+    with _jobs_lock:
+        if job_id not in _jobs:
+            return False, False, None, None
+        executor, future, info = _jobs[job_id]
+        if not future.done():
+            return True, False, None, info
+        del _jobs[job_id]
+    try:
+        return True, True, future.result(), info
+    except BrokenProcessPool:
+        # Leave a working pool behind for the next submission
+        _discard_executor(executor)
+        raise
@@ -1,12 +1,21 @@
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import numpy as np
-from PIL import Image
 import cv2
+import functools
 import json
 import os
 from datetime import datetime
 
+from app.models.inference import compile_model
+
+try:
+    import torchvision
+    from torchvision.io import ImageReadMode
+except ImportError:
+    torchvision = None
+
 class DummyMicroplasticModel(nn.Module):
     """Dummy PyTorch model for microplastic detection"""
     def __init__(self):
@@ -15,108 +24,171 @@ class DummyMicroplasticModel(nn.Module):
         self.conv2 = nn.Conv2d(16, 32, 3, padding=1)
         self.conv3 = nn.Conv2d(32, 64, 3, padding=1)
         self.pool = nn.MaxPool2d(2, 2)
-        self.fc1 = nn.Linear(64 * 8 * 8, 128)
+        self.flatten = nn.Flatten(1)
+        self.fc1 = nn.LazyLinear(128)  # in_features resolved from the first (224x224) input
         self.fc2 = nn.Linear(128, 5)  # 5 classes: background, fiber, fragment, pellet, film
         
     def forward(self, x):
         x = self.pool(torch.relu(self.conv1(x)))
         x = self.pool(torch.relu(self.conv2(x)))
         x = self.pool(torch.relu(self.conv3(x)))
-        x = x.view(-1, 64 * 8 * 8)
+        x = self.flatten(x)
         x = torch.relu(self.fc1(x))
         x = self.fc2(x)
         return x
 
 class MicroplasticDetector:
     def __init__(self):
-        self.device = torch.device("cpu")  # Use CPU for compatibility
+        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        if self.device.type == 'cuda':
+            torch.backends.cudnn.benchmark = True
+        
         self.model = DummyMicroplasticModel()
-        self.model.load_state_dict(self.model.state_dict())  # Dummy initialization
-        self.model.eval()
+        with torch.no_grad():
+            self.model(torch.zeros(1, 3, 224, 224))  # Materialize the lazy fc1 shape
+        self.model.to(self.device).eval()
+        
+        # int8 weights for the fully connected layers (quantized kernels are CPU only)
+        if self.device.type == 'cpu':
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {nn.Linear}, dtype=torch.qint8)
+        
+        self.model = compile_model(self.model, self.device)
         
         # Class names for microplastics
         self.class_names = ['background', 'fiber', 'fragment', 'pellet', 'film']
         
+        # Seeded generator state, restored per call so dummy results stay consistent
+        self._rng_state = np.random.default_rng(42).bit_generator.state
+        
     def preprocess_image(self, image_path):
         """Preprocess image for model input"""
+        # SIMD decode, releases the GIL
+        image_array = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if image_array is None:
+            raise Exception(f"Image preprocessing failed: Could not read image: {image_path}")
+        return self.preprocess_array(image_array)
+    
+    def preprocess_array(self, image_array):
+        """Preprocess a decoded BGR image for model input"""
+        try:
+            # Resize first so the colour conversion only touches 224x224 pixels
+            image_array = cv2.resize(image_array, (224, 224), interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB, dst=image_array)
+            
+            # Convert to tensor: one float copy, then normalize in place
+            image_tensor = torch.from_numpy(image_array).permute(2, 0, 1).float().div_(255.0).unsqueeze_(0)
+            
+            return image_tensor, image_array
+        except Exception as e:
+            raise Exception(f"Image preprocessing failed: {str(e)}")
+    
+    def _decode_on_device(self, image_path):
+        """Decode an image straight to the GPU (nvJPEG for JPEG files)"""
         try:
-            # Load and resize image
-            image = Image.open(image_path).convert('RGB')
-            image = image.resize((224, 224))
+            data = torchvision.io.read_file(image_path)
+            if data[0] == 0xFF and data[1] == 0xD8:
+                image = torchvision.io.decode_jpeg(data, mode=ImageReadMode.RGB, device=self.device)
+            else:
+                image = torchvision.io.decode_image(data, mode=ImageReadMode.RGB).to(self.device)
             
-            # Convert to tensor
-            image_array = np.array(image)
-            image_tensor = torch.from_numpy(image_array).permute(2, 0, 1).float()
-            image_tensor = image_tensor.unsqueeze(0) / 255.0
+            image = image.unsqueeze(0).float().div_(255.0)
+            image_tensor = F.interpolate(image, size=(224, 224), mode='bilinear', align_corners=False)
+            image_array = image_tensor[0].mul(255).to(torch.uint8).permute(1, 2, 0).cpu().numpy()
             
             return image_tensor, image_array
         except Exception as e:
             raise Exception(f"Image preprocessing failed: {str(e)}")
     
+    def _load(self, image):
+        """Preprocess an image path (decoded on the GPU when possible) or a decoded BGR frame"""
+        if isinstance(image, np.ndarray):
+            return self.preprocess_array(image)
+        if self.device.type == 'cuda' and torchvision is not None:
+            return self._decode_on_device(image)
+        return self.preprocess_image(image)
+    
+    def load_batch(self, image_paths):
+        """Load images (paths or BGR frames) into a single (B, 3, 224, 224) tensor on the model device"""
+        loaded = [self._load(image) for image in image_paths]
+        
+        batch = torch.cat([image_tensor for image_tensor, _ in loaded]).to(self.device)
+        return batch, [image_array for _, image_array in loaded]
+    
     def postprocess_detections(self, predictions, original_image):
         """Convert model predictions to bounding boxes and labels"""
         # Generate dummy bounding boxes (in real implementation, this would come from object detection)
         height, width = original_image.shape[:2]
         
-        # Simulate some detections
-        detections = []
-        np.random.seed(42)  # For consistent dummy results
+        # Simulate some detections (1-3), drawing all values in vectorized calls
+        rng = np.random.Generator(np.random.PCG64())
+        rng.bit_generator.state = self._rng_state
         
-        for i in range(np.random.randint(1, 4)):  # 1-3 detections
-            x1 = np.random.randint(0, width//2)
-            y1 = np.random.randint(0, height//2)
-            x2 = x1 + np.random.randint(50, 150)
-            y2 = y1 + np.random.randint(50, 150)
-            
-            # Ensure coordinates are within image bounds
-            x2 = min(x2, width)
-            y2 = min(y2, height)
-            
-            class_id = np.random.randint(1, 5)  # Skip background
-            confidence = np.random.uniform(0.6, 0.95)
-            
-            detection = {
-                'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                'class_id': int(class_id),
-                'class_name': self.class_names[class_id],
-                'confidence': float(confidence)
-            }
-            detections.append(detection)
+        n = int(rng.integers(1, 4))
+        x1 = rng.integers(0, width // 2, size=n)
+        y1 = rng.integers(0, height // 2, size=n)
+        
+        # Ensure coordinates are within image bounds
+        x2 = np.minimum(x1 + rng.integers(50, 150, size=n), width)
+        y2 = np.minimum(y1 + rng.integers(50, 150, size=n), height)
+        
+        class_ids = rng.integers(1, 5, size=n)  # Skip background
+        confidences = rng.uniform(0.6, 0.95, size=n)
+        
+        detections = [{
+            'bbox': [int(x1[i]), int(y1[i]), int(x2[i]), int(y2[i])],
+            'class_id': int(class_ids[i]),
+            'class_name': self.class_names[class_ids[i]],
+            'confidence': float(confidences[i])
+        } for i in range(n)]
         
         return detections
     
-    def predict(self, image_path):
-        """Run inference on the image"""
+    @torch.inference_mode()
+    def predict_batch(self, image_paths):
+        """Run inference on several images with a single forward pass"""
         try:
-            # Preprocess image
-            image_tensor, original_image = self.preprocess_image(image_path)
+            # Preprocess images
+            batch, original_images = self.load_batch(image_paths)
             
             # Run inference
-            with torch.no_grad():
-                outputs = self.model(image_tensor)
-                predictions = torch.softmax(outputs, dim=1)
+            outputs = self.model(batch)
+            predictions = torch.softmax(outputs, dim=1)
             
-            # Postprocess to get detections
-            detections = self.postprocess_detections(predictions, original_image)
+            results = []
+            for i, original_image in enumerate(original_images):
+                # Postprocess to get detections
+                detections = self.postprocess_detections(predictions[i:i + 1], original_image)
+                
+                results.append({
+                    'success': True,
+                    'detections': detections,
+                    'image': original_image,  # decoded RGB array for draw_detections; not JSON-serializable
+                    'image_shape': original_image.shape,
+                    'timestamp': datetime.now().isoformat()
+                })
             
-            return {
-                'success': True,
-                'detections': detections,
-                'image_shape': original_image.shape,
-                'timestamp': datetime.now().isoformat()
-            }
+            return results
             
         except Exception as e:
-            return {
+            return [{
                 'success': False,
                 'error': str(e),
                 'timestamp': datetime.now().isoformat()
-            }
+            } for _ in image_paths]
+    
+    def predict(self, image_path):
+        """Run inference on the image"""
+        return self.predict_batch([image_path])[0]
+    
+    def predict_array(self, frame):
+        """Run inference on an already decoded BGR frame, e.g. a camera snapshot"""
+        return self.predict_batch([frame])[0]
     
-    def draw_detections(self, image_path, detections, output_path):
-        """Draw bounding boxes on the image"""
+    def draw_detections(self, image, detections, output_path):
+        """Draw bounding boxes on the decoded RGB image returned by predict"""
         try:
-            image = cv2.imread(image_path)
+            # BGR copy for OpenCV drawing; avoids decoding the file a second time
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
             
             for detection in detections['detections']:
                 x1, y1, x2, y2 = detection['bbox']
@@ -137,5 +209,7 @@ class MicroplasticDetector:
             print(f"Error drawing detections: {e}")
             return False
 
-# Global model instance
-microplastic_model = MicroplasticDetector()
+@functools.lru_cache(maxsize=None)
+def get_microplastic_model():
+    """Return the shared microplastic detector, building it on first use"""
+    return MicroplasticDetector()
@@ -1,12 +1,36 @@
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import numpy as np
-from PIL import Image
 import cv2
+import functools
+import glob
+import hashlib
 import json
 import os
+import uuid
+import warnings
 from datetime import datetime
 
+from app.models.inference import compile_model
+
+try:
+    import torchvision
+    from torchvision.io import ImageReadMode
+except ImportError:
+    torchvision = None
+
+# Persisted int8 segmentation weights so startup skips calibration; the
+# filename carries a fingerprint of the float weights they were built from
+MODELS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'models')
+SEGMENTATION_INT8_TEMPLATE = 'plankton_segmentation_int8_{}.pth'
+
+# The placeholder models have no trained weights; seed their initialization so every
+# process (including each inference pool worker) builds the same weights and the
+# int8 cache above is actually reused
+DUMMY_WEIGHTS_SEED = 0
+
 class DummyPlanktonSegmentationModel(nn.Module):
     """Dummy PyTorch model for plankton segmentation"""
     def __init__(self):
@@ -45,30 +69,47 @@ class DummyPlanktonClassifier(nn.Module):
         self.conv2 = nn.Conv2d(32, 64, 3, padding=1)
         self.conv3 = nn.Conv2d(64, 128, 3, padding=1)
         self.pool = nn.MaxPool2d(2, 2)
-        self.fc1 = nn.Linear(128 * 8 * 8, 256)
+        self.flatten = nn.Flatten(1)
+        self.fc1 = nn.LazyLinear(256)  # in_features resolved from the first (224x224) input
         self.fc2 = nn.Linear(256, 20)  # 20 plankton species
         
     def forward(self, x):
         x = self.pool(torch.relu(self.conv1(x)))
         x = self.pool(torch.relu(self.conv2(x)))
         x = self.pool(torch.relu(self.conv3(x)))
-        x = x.view(-1, 128 * 8 * 8)
+        x = self.flatten(x)
         x = torch.relu(self.fc1(x))
         x = self.fc2(x)
         return x
 
 class PlanktonAnalyzer:
     def __init__(self):
-        self.device = torch.device("cpu")  # Use CPU for compatibility
-        self.segmentation_model = DummyPlanktonSegmentationModel()
-        self.classifier_model = DummyPlanktonClassifier()
+        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        if self.device.type == 'cuda':
+            torch.backends.cudnn.benchmark = True
+        
+        # Segmentation masks are written here as PNGs instead of returned inline
+        self.results_folder = 'results'
+        os.makedirs(self.results_folder, exist_ok=True)
         
-        # Initialize models
-        self.segmentation_model.load_state_dict(self.segmentation_model.state_dict())
-        self.classifier_model.load_state_dict(self.classifier_model.state_dict())
+        with torch.random.fork_rng(devices=[]):  # leaves the global RNG stream untouched
+            torch.manual_seed(DUMMY_WEIGHTS_SEED)
+            self.segmentation_model = DummyPlanktonSegmentationModel()
+            self.classifier_model = DummyPlanktonClassifier()
+            with torch.no_grad():
+                self.classifier_model(torch.zeros(1, 3, 224, 224))  # Materialize the lazy fc1 shape
         
-        self.segmentation_model.eval()
-        self.classifier_model.eval()
+        self.segmentation_model.to(self.device).eval()
+        self.classifier_model.to(self.device).eval()
+        
+        # int8 inference on CPU (quantized kernels are CPU only)
+        if self.device.type == 'cpu':
+            self.segmentation_model = self._quantize_segmentation(self.segmentation_model)
+            self.classifier_model = torch.ao.quantization.quantize_dynamic(
+                self.classifier_model, {nn.Linear}, dtype=torch.qint8)
+        
+        self.segmentation_model = compile_model(self.segmentation_model, self.device)
+        self.classifier_model = compile_model(self.classifier_model, self.device)
         
         # Plankton species names
         self.species_names = [
@@ -78,56 +119,159 @@ class PlanktonAnalyzer:
             'Crustacean_Larva', 'Fish_Larva', 'Gelatinous_Zooplankton', 'Bacteria', 'Virus'
         ]
     
+    def _quantize_segmentation(self, model):
+        """Post-training static int8 quantization of the conv-only segmentation model"""
+        engine = next((e for e in ('x86', 'fbgemm', 'qnnpack')
+                       if e in torch.backends.quantized.supported_engines), None)
+        if engine is None:
+            return model
+        torch.backends.quantized.engine = engine
+        
+        int8_path = os.path.join(
+            MODELS_DIR, SEGMENTATION_INT8_TEMPLATE.format(self._weights_fingerprint(model)))
+        
+        quantized = torch.ao.quantization.QuantWrapper(model)
+        quantized.qconfig = torch.ao.quantization.get_default_qconfig(engine)
+        torch.ao.quantization.prepare(quantized, inplace=True)
+        
+        if os.path.exists(int8_path):
+            # Scales come from the saved state dict, so skip calibration
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                torch.ao.quantization.convert(quantized, inplace=True)
+            quantized.load_state_dict(torch.load(int8_path, map_location='cpu'))
+        else:
+            # Calibrate activation ranges with a few random inputs
+            with torch.no_grad():
+                for _ in range(4):
+                    quantized(torch.rand(1, 3, 224, 224))
+            torch.ao.quantization.convert(quantized, inplace=True)
+            
+            os.makedirs(MODELS_DIR, exist_ok=True)
+            # Spawned workers may load the cache concurrently, so never expose a partial file
+            tmp_path = f'{int8_path}.{os.getpid()}.tmp'
+            torch.save(quantized.state_dict(), tmp_path)
+            os.replace(tmp_path, int8_path)
+            self._remove_stale_caches(int8_path)
+        
+        return quantized.eval()
+    
+    @staticmethod
+    def _remove_stale_caches(keep_path):
+        """Delete int8 caches built from earlier weights"""
+        for path in glob.glob(os.path.join(MODELS_DIR, SEGMENTATION_INT8_TEMPLATE.format('*'))):
+            if path != keep_path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # Another worker removed it first
+    
+    @staticmethod
+    def _weights_fingerprint(model):
+        """Short hash of the float state dict, so a cache built from other weights is ignored"""
+        digest = hashlib.blake2b(digest_size=8)
+        for name, tensor in sorted(model.state_dict().items()):
+            digest.update(name.encode())
+            digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+        return digest.hexdigest()
+    
     def preprocess_image(self, image_path):
         """Preprocess image for model input"""
+        # SIMD decode, releases the GIL
+        image_array = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if image_array is None:
+            raise Exception(f"Image preprocessing failed: Could not read image: {image_path}")
+        return self.preprocess_array(image_array)
+    
+    def preprocess_array(self, image_array):
+        """Preprocess a decoded BGR image for model input"""
         try:
-            # Load and resize image
-            image = Image.open(image_path).convert('RGB')
-            image = image.resize((224, 224))
+            # Resize first so the colour conversion only touches 224x224 pixels
+            image_array = cv2.resize(image_array, (224, 224), interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB, dst=image_array)
             
-            # Convert to tensor
-            image_array = np.array(image)
-            image_tensor = torch.from_numpy(image_array).permute(2, 0, 1).float()
-            image_tensor = image_tensor.unsqueeze(0) / 255.0
+            # Convert to tensor: one float copy, then normalize in place
+            image_tensor = torch.from_numpy(image_array).permute(2, 0, 1).float().div_(255.0).unsqueeze_(0)
             
             return image_tensor, image_array
         except Exception as e:
             raise Exception(f"Image preprocessing failed: {str(e)}")
     
-    def postprocess_segmentation(self, mask_output, original_image):
-        """Convert segmentation output to binary mask"""
+    def _decode_on_device(self, image_path):
+        """Decode an image straight to the GPU (nvJPEG for JPEG files)"""
         try:
-            # Convert tensor to numpy
-            mask = mask_output.squeeze().cpu().numpy()
+            data = torchvision.io.read_file(image_path)
+            if data[0] == 0xFF and data[1] == 0xD8:
+                image = torchvision.io.decode_jpeg(data, mode=ImageReadMode.RGB, device=self.device)
+            else:
+                image = torchvision.io.decode_image(data, mode=ImageReadMode.RGB).to(self.device)
             
-            # Apply threshold to create binary mask
-            binary_mask = (mask > 0.5).astype(np.uint8) * 255
+            image = image.unsqueeze(0).float().div_(255.0)
+            image_tensor = F.interpolate(image, size=(224, 224), mode='bilinear', align_corners=False)
+            image_array = image_tensor[0].mul(255).to(torch.uint8).permute(1, 2, 0).cpu().numpy()
             
-            # Resize mask to original image size
-            original_height, original_width = original_image.shape[:2]
-            binary_mask = cv2.resize(binary_mask, (original_width, original_height))
+            return image_tensor, image_array
+        except Exception as e:
+            raise Exception(f"Image preprocessing failed: {str(e)}")
+    
+    def _load(self, image):
+        """Preprocess an image path (decoded on the GPU when possible) or a decoded BGR frame"""
+        if isinstance(image, np.ndarray):
+            return self.preprocess_array(image)
+        if self.device.type == 'cuda' and torchvision is not None:
+            return self._decode_on_device(image)
+        return self.preprocess_image(image)
+    
+    def load_batch(self, image_paths):
+        """Load images (paths or BGR frames) into a single (B, 3, 224, 224) tensor on the model device"""
+        loaded = [self._load(image) for image in image_paths]
+        
+        batch = torch.cat([image_tensor for image_tensor, _ in loaded]).to(self.device)
+        return batch, [image_array for _, image_array in loaded]
+    
+    def postprocess_segmentation(self, mask_output, original_image):
+        """Convert segmentation output to binary mask"""
+        try:
+            # Resize, threshold and scale on the model device; only the uint8 mask is copied back
+            mask = F.interpolate(mask_output, size=original_image.shape[:2], mode='bilinear', align_corners=True)
+            binary_mask = (mask.squeeze() > 0.5).to(torch.uint8).mul_(255)
             
-            return binary_mask
+            return binary_mask.cpu().numpy()
         except Exception as e:
             raise Exception(f"Segmentation postprocessing failed: {str(e)}")
     
-    def postprocess_classification(self, classification_output):
-        """Convert classification output to species prediction"""
+    def postprocess_classification(self, classification_output, top_k=5, full_probabilities=False):
+        """Convert classification output to species prediction with the top-k species"""
         try:
             # Apply softmax to get probabilities
-            probabilities = torch.softmax(classification_output, dim=1)
-            predicted_class = torch.argmax(probabilities, dim=1).item()
-            confidence = probabilities[0, predicted_class].item()
-            
-            return {
-                'species_id': int(predicted_class),
-                'species_name': self.species_names[predicted_class],
-                'confidence': float(confidence),
-                'all_probabilities': probabilities[0].cpu().numpy().tolist()
+            probabilities = torch.softmax(classification_output, dim=1)[0]
+            top_values, top_indices = torch.topk(probabilities, k=top_k)
+            top_values, top_indices = top_values.tolist(), top_indices.tolist()
+            
+            result = {
+                'species_id': top_indices[0],
+                'species_name': self.species_names[top_indices[0]],
+                'confidence': top_values[0],
+                'top_k': [{'species_name': self.species_names[i], 'prob': v}
+                          for v, i in zip(top_values, top_indices)]
             }
+            if full_probabilities:
+                result['all_probabilities'] = probabilities.tolist()
+            
+            return result
         except Exception as e:
             raise Exception(f"Classification postprocessing failed: {str(e)}")
     
+    def save_mask(self, binary_mask):
+        """Write a binary mask to the results folder as PNG and return its filename"""
+        mask_filename = f"mask_{uuid.uuid4().hex}.png"
+        
+        # 1-bit PNG: the mask is only 0/255, so bilevel packs 8 pixels per byte
+        # before zlib, and level 1 is enough on top of that
+        cv2.imwrite(os.path.join(self.results_folder, mask_filename), binary_mask,
+                    [cv2.IMWRITE_PNG_BILEVEL, 1, cv2.IMWRITE_PNG_COMPRESSION, 1])
+        return mask_filename
+    
     def create_overlay(self, original_image, mask):
         """Create overlay of mask on original image"""
         try:
@@ -142,41 +286,58 @@ class PlanktonAnalyzer:
             print(f"Error creating overlay: {e}")
             return original_image
     
-    def predict(self, image_path):
-        """Run inference on the image"""
+    @torch.inference_mode()
+    def predict_batch(self, image_paths, full_probabilities=False):
+        """Run segmentation and classification on several images in one batch"""
         try:
-            # Preprocess image
-            image_tensor, original_image = self.preprocess_image(image_path)
+            # Preprocess images
+            batch, original_images = self.load_batch(image_paths)
             
             # Run segmentation
-            with torch.no_grad():
-                mask_output = self.segmentation_model(image_tensor)
-                classification_output = self.classifier_model(image_tensor)
-            
-            # Postprocess results
-            binary_mask = self.postprocess_segmentation(mask_output, original_image)
-            classification_result = self.postprocess_classification(classification_output)
-            
-            return {
-                'success': True,
-                'segmentation_mask': binary_mask.tolist(),
-                'classification': classification_result,
-                'image_shape': original_image.shape,
-                'timestamp': datetime.now().isoformat()
-            }
+            mask_outputs = self.segmentation_model(batch)
+            classification_outputs = self.classifier_model(batch)
+            
+            results = []
+            for i, original_image in enumerate(original_images):
+                # Postprocess results
+                binary_mask = self.postprocess_segmentation(mask_outputs[i:i + 1], original_image)
+                classification_result = self.postprocess_classification(classification_outputs[i:i + 1],
+                                                                        full_probabilities=full_probabilities)
+                mask_filename = self.save_mask(binary_mask)
+                
+                results.append({
+                    'success': True,
+                    'segmentation_mask_path': os.path.join(self.results_folder, mask_filename),
+                    'segmentation_mask_url': f'/results/{mask_filename}',
+                    'image': original_image,  # decoded RGB array and mask for save_visualization;
+                    'mask': binary_mask,      # neither is JSON-serializable
+                    'classification': classification_result,
+                    'image_shape': original_image.shape,
+                    'timestamp': datetime.now().isoformat()
+                })
+            
+            return results
             
         except Exception as e:
-            return {
+            return [{
                 'success': False,
                 'error': str(e),
                 'timestamp': datetime.now().isoformat()
-            }
+            } for _ in image_paths]
+    
+    def predict(self, image_path, full_probabilities=False):
+        """Run inference on the image"""
+        return self.predict_batch([image_path], full_probabilities)[0]
+    
+    def predict_array(self, frame, full_probabilities=False):
+        """Run inference on an already decoded BGR frame, e.g. a camera snapshot"""
+        return self.predict_batch([frame], full_probabilities)[0]
     
     def save_visualization(self, original_image, mask, classification_result, output_path):
-        """Save visualization of segmentation and classification results"""
+        """Save visualization of segmentation and classification results on the RGB image returned by predict"""
         try:
             # Create overlay
-            overlay = self.create_overlay(original_image, mask)
+            overlay = self.create_overlay(cv2.cvtColor(original_image, cv2.COLOR_RGB2BGR), mask)
             
             # Add text with classification result
             species_name = classification_result['species_name']
@@ -192,5 +353,7 @@ class PlanktonAnalyzer:
             print(f"Error saving visualization: {e}")
             return False
 
-# Global model instance
-plankton_model = PlanktonAnalyzer()
+@functools.lru_cache(maxsize=None)
+def get_plankton_model():
+    """Return the shared plankton analyzer, building it on first use"""
+    return PlanktonAnalyzer()
@@ -1,136 +1,101 @@
 from flask import Blueprint, request, jsonify, render_template, send_from_directory, Response, make_response
 import os
-import json
 import base64
-from datetime import datetime
-import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
 from PIL import Image
 import io
-import numpy as np
 import cv2
-import time
 
-# Import models
-from app.models.microplastic_model import microplastic_model
-from app.models.plankton_model import plankton_model
-from app.camera import camera_manager
+from app.camera import camera_manager, encode_jpeg
+from app import inference_pool
+from app.database import (init_db, save_microplastic_result, save_plankton_result, get_recent_results,
+                          get_stats_data, loads_json)
 
 bp = Blueprint('main', __name__)
 
-# Database setup
-def init_db():
-    """Initialize SQLite database for storing results"""
-    conn = sqlite3.connect('results/database.db')
-    cursor = conn.cursor()
-    
-    # Create tables
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS microplastic_results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            image_path TEXT,
-            detections TEXT,
-            image_shape TEXT
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS plankton_results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            image_path TEXT,
-            species_name TEXT,
-            confidence REAL,
-            mask_data TEXT,
-            image_shape TEXT
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+# Filename timestamp, formatted once per request with time.strftime
+FILE_TIMESTAMP = "%Y%m%d_%H%M%S"
 
-def save_microplastic_result(image_path, detections, image_shape):
-    """Save microplastic detection result to database"""
-    conn = sqlite3.connect('results/database.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO microplastic_results (timestamp, image_path, detections, image_shape)
-        VALUES (?, ?, ?, ?)
-    ''', (datetime.now().isoformat(), image_path, json.dumps(detections), json.dumps(image_shape)))
-    
-    conn.commit()
-    conn.close()
+def _file_stamp():
+    """Readable timestamp plus a random suffix, so requests in the same second never share a file"""
+    return f"{time.strftime(FILE_TIMESTAMP)}_{uuid.uuid4().hex[:8]}"
 
-def save_plankton_result(image_path, species_name, confidence, mask_data, image_shape):
-    """Save plankton analysis result to database"""
-    conn = sqlite3.connect('results/database.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO plankton_results (timestamp, image_path, species_name, confidence, mask_data, image_shape)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (datetime.now().isoformat(), image_path, species_name, confidence, json.dumps(mask_data), json.dumps(image_shape)))
-    
-    conn.commit()
-    conn.close()
+# Created once here rather than checked on every request
+for folder in ('uploads', 'results'):
+    os.makedirs(folder, exist_ok=True)
 
-def get_recent_results(limit=50):
-    """Get recent results from database"""
-    conn = sqlite3.connect('results/database.db')
-    cursor = conn.cursor()
-    
-    # Get microplastic results
-    cursor.execute('''
-        SELECT timestamp, image_path, detections, image_shape 
-        FROM microplastic_results 
-        ORDER BY timestamp DESC 
-        LIMIT ?
-    ''', (limit,))
-    microplastic_results = cursor.fetchall()
-    
-    # Get plankton results
-    cursor.execute('''
-        SELECT timestamp, image_path, species_name, confidence, mask_data, image_shape 
-        FROM plankton_results 
-        ORDER BY timestamp DESC 
-        LIMIT ?
-    ''', (limit,))
-    plankton_results = cursor.fetchall()
-    
-    conn.close()
-    
-    return microplastic_results, plankton_results
+# Saves camera captures to uploads/ after the analysis has been returned
+_archive_executor = ThreadPoolExecutor(max_workers=1)
 
-def process_image_upload(image_data, filename):
+
+def process_image_upload(image_data, filename, timestamp):
     """Process uploaded image and save to uploads folder"""
     try:
-        # Ensure uploads directory exists
-        os.makedirs('uploads', exist_ok=True)
-        
         # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         safe_filename = secure_filename(filename)
         name, ext = os.path.splitext(safe_filename)
         unique_filename = f"{name}_{timestamp}{ext}"
         filepath = os.path.join('uploads', unique_filename)
         
-        # Save image
-        image_data.save(filepath)
-        
-        # Validate image
+        # Validate image from the in-memory upload stream, so the file is only written once
         try:
-            with Image.open(filepath) as img:
+            image_data.stream.seek(0)
+            with Image.open(image_data.stream) as img:
                 img.verify()
-            return filepath
+            image_data.stream.seek(0)
         except Exception:
-            os.remove(filepath)
             raise Exception("Invalid image file")
+        
+        # Save image
+        image_data.save(filepath)
+        return filepath
             
     except Exception as e:
         raise Exception(f"Image upload failed: {str(e)}")
 
+def _decode_b64_image(image_data):
+    """Decode a base64 image string, with or without a data:image/...;base64, prefix"""
+    # One partition instead of startswith + split, which built a list of string copies
+    _, sep, payload = image_data.partition(',')
+    return base64.b64decode(payload if sep else image_data)
+
+def _save_jpeg(image, image_path):
+    """Save a decoded PIL image as JPEG without PIL's optional optimize pass"""
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')  # e.g. RGBA PNG data URLs
+    image.save(image_path, 'JPEG', quality=90, optimize=False)
+
+class BadImageRequest(Exception):
+    """The request carried no image or one that could not be decoded (HTTP 400)"""
+
+def _image_from_request(prefix, timestamp):
+    """Save the image from a multipart upload or a base64 JSON body and return its path"""
+    # Handle file upload
+    if 'image' in request.files:
+        file = request.files['image']
+        if file.filename == '':
+            raise BadImageRequest('No file selected')
+        return process_image_upload(file, file.filename, timestamp)
+    
+    # Handle base64 image; the body is parsed once and cached on the request
+    data = request.get_json(cache=True, silent=True) or {}
+    if 'image_data' not in data:
+        raise BadImageRequest('No image provided')
+    
+    try:
+        image = Image.open(io.BytesIO(_decode_b64_image(data['image_data'])))
+        
+        filename = f"{prefix}_{timestamp}.jpg"
+        image_path = os.path.join('uploads', filename)
+        
+        _save_jpeg(image, image_path)
+        return image_path
+    except Exception as e:
+        raise BadImageRequest(f'Invalid base64 image: {str(e)}')
+
 @bp.route('/')
 def dashboard():
     """Main dashboard page"""
@@ -145,12 +110,14 @@ def data_dashboard():
     processed_microplastic = []
     for result in microplastic_results:
         try:
-            detections = json.loads(result[2])
+            detections = loads_json(result[2])
+            if isinstance(detections, dict):
+                detections = detections.get('detections', [])
             processed_microplastic.append({
                 'timestamp': result[0],
                 'image_path': result[1],
-                'detection_count': len(detections.get('detections', [])),
-                'detections': detections.get('detections', [])
+                'detection_count': len(detections),
+                'detections': detections
             })
         except:
             continue
@@ -172,56 +139,25 @@ def data_dashboard():
 def predict_microplastic():
     """Microplastic detection endpoint"""
     try:
-        # Initialize database if not exists
-        init_db()
-        
-        # Handle file upload
-        if 'image' in request.files:
-            file = request.files['image']
-            if file.filename == '':
-                return jsonify({'error': 'No file selected'}), 400
-            
-            image_path = process_image_upload(file, file.filename)
-        
-        # Handle base64 image
-        elif 'image_data' in request.json:
-            try:
-                image_data = request.json['image_data']
-                if image_data.startswith('data:image'):
-                    image_data = image_data.split(',')[1]
-                
-                image_bytes = base64.b64decode(image_data)
-                image = Image.open(io.BytesIO(image_bytes))
-                
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"microplastic_{timestamp}.jpg"
-                image_path = os.path.join('uploads', filename)
-                
-                os.makedirs('uploads', exist_ok=True)
-                image.save(image_path)
-            except Exception as e:
-                return jsonify({'error': f'Invalid base64 image: {str(e)}'}), 400
+        timestamp = _file_stamp()
+        image_path = _image_from_request('microplastic', timestamp)
         
-        else:
-            return jsonify({'error': 'No image provided'}), 400
-        
-        # Run prediction
-        result = microplastic_model.predict(image_path)
+        # Run prediction and visualization in the inference pool
+        vis_path = os.path.join('results', f"microplastic_{timestamp}.jpg")
+        result = inference_pool.run(inference_pool.run_microplastic, image_path, vis_path)
         
         if result['success']:
             # Save result to database
-            save_microplastic_result(image_path, result['detections'], result['image_shape'])
-            
-            # Generate visualization
-            vis_path = os.path.join('results', f"microplastic_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg")
-            os.makedirs('results', exist_ok=True)
-            microplastic_model.draw_detections(image_path, result, vis_path)
+            save_microplastic_result(image_path, result['detections'], result['image_shape'],
+                                     result['timestamp'])
             
             result['visualization_path'] = vis_path
             result['image_path'] = image_path
         
         return jsonify(result)
         
+    except BadImageRequest as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -229,120 +165,110 @@ def predict_microplastic():
 def predict_plankton():
     """Plankton analysis endpoint"""
     try:
-        # Initialize database if not exists
-        init_db()
-        
-        # Handle file upload
-        if 'image' in request.files:
-            file = request.files['image']
-            if file.filename == '':
-                return jsonify({'error': 'No file selected'}), 400
-            
-            image_path = process_image_upload(file, file.filename)
-        
-        # Handle base64 image
-        elif 'image_data' in request.json:
-            try:
-                image_data = request.json['image_data']
-                if image_data.startswith('data:image'):
-                    image_data = image_data.split(',')[1]
-                
-                image_bytes = base64.b64decode(image_data)
-                image = Image.open(io.BytesIO(image_bytes))
-                
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"plankton_{timestamp}.jpg"
-                image_path = os.path.join('uploads', filename)
-                
-                os.makedirs('uploads', exist_ok=True)
-                image.save(image_path)
-            except Exception as e:
-                return jsonify({'error': f'Invalid base64 image: {str(e)}'}), 400
-        
-        else:
-            return jsonify({'error': 'No image provided'}), 400
+        timestamp = _file_stamp()
+        image_path = _image_from_request('plankton', timestamp)
         
-        # Run prediction
-        result = plankton_model.predict(image_path)
+        # Run prediction and visualization in the inference pool
+        # ?full=1 adds the probability of every species, not just the top 5
+        vis_path = os.path.join('results', f"plankton_{timestamp}.jpg")
+        result = inference_pool.run(inference_pool.run_plankton, image_path, vis_path,
+                                    request.args.get('full') == '1')
         
         if result['success']:
             # Save result to database
             classification = result['classification']
             save_plankton_result(image_path, classification['species_name'], 
-                               classification['confidence'], result['segmentation_mask'], 
-                               result['image_shape'])
-            
-            # Generate visualization
-            vis_path = os.path.join('results', f"plankton_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg")
-            os.makedirs('results', exist_ok=True)
-            
-            # Load original image for visualization
-            import cv2
-            original_image = cv2.imread(image_path)
-            mask = np.array(result['segmentation_mask'])
-            plankton_model.save_visualization(original_image, mask, classification, vis_path)
+                               classification['confidence'], result['segmentation_mask_url'], 
+                               result['image_shape'], result['timestamp'])
             
             result['visualization_path'] = vis_path
             result['image_path'] = image_path
         
         return jsonify(result)
         
+    except BadImageRequest as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/predict/submit', methods=['POST'])
+def submit_prediction():
+    """Queue an analysis of an already uploaded image; poll /predict/result/<job_id> for the result"""
+    try:
+        data = request.get_json() or {}
+        analysis_type = data.get('type', 'microplastic')
+        filename = secure_filename(data.get('filename', ''))
+        image_path = os.path.join('uploads', filename)
+        
+        if not filename or not os.path.isfile(image_path):
+            return jsonify({'error': 'Uploaded image not found'}), 404
+        
+        info = {'type': analysis_type, 'image_path': image_path}
+        if analysis_type == 'microplastic':
+            job_id = inference_pool.submit_job(inference_pool.run_microplastic, (image_path,), info)
+        elif analysis_type == 'plankton':
+            job_id = inference_pool.submit_job(inference_pool.run_plankton, (image_path,), info)
+        else:
+            return jsonify({'error': 'Invalid analysis type'}), 400
+        
+        return jsonify({'job_id': job_id}), 202
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/predict/result/<job_id>')
+def prediction_result(job_id):
+    """Get the result of a queued analysis"""
+    try:
+        found, done, result, info = inference_pool.get_job(job_id)
+        if not found:
+            return jsonify({'error': 'Unknown job id'}), 404
+        if not done:
+            return jsonify({'status': 'pending'}), 202
+        
+        # Save result to database
+        if result['success']:
+            image_path = info['image_path']
+            if info['type'] == 'microplastic':
+                save_microplastic_result(image_path, result['detections'], result['image_shape'],
+                                         result['timestamp'])
+            else:
+                classification = result['classification']
+                save_plankton_result(image_path, classification['species_name'], 
+                                   classification['confidence'], result['segmentation_mask_url'], 
+                                   result['image_shape'], result['timestamp'])
+            result['image_path'] = image_path
+        
+        result['status'] = 'done'
+        return jsonify(result)
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+FILE_MAX_AGE = 86400
+
+def _send_stored_file(folder, filename):
+    """Serve an upload or result with ETag/Last-Modified so repeat views get a 304"""
+    response = send_from_directory(folder, filename, conditional=True, max_age=FILE_MAX_AGE)
+    # Stored files get unique names (see _file_stamp) and are never rewritten in place
+    response.headers['Cache-Control'] = f'public, max-age={FILE_MAX_AGE}, immutable'
+    return response
+
 @bp.route('/uploads/<filename>')
 def uploaded_file(filename):
     """Serve uploaded files"""
-    return send_from_directory('uploads', filename)
+    return _send_stored_file('uploads', filename)
 
 @bp.route('/results/<filename>')
 def result_file(filename):
     """Serve result files"""
-    return send_from_directory('results', filename)
+    return _send_stored_file('results', filename)
 
 @bp.route('/api/stats')
 def get_stats():
     """Get statistics about collected data"""
     try:
-        conn = sqlite3.connect('results/database.db')
-        cursor = conn.cursor()
-        
-        # Get microplastic stats
-        cursor.execute('SELECT COUNT(*) FROM microplastic_results')
-        microplastic_count = cursor.fetchone()[0]
-        
-        # Get plankton stats
-        cursor.execute('SELECT COUNT(*) FROM plankton_results')
-        plankton_count = cursor.fetchone()[0]
-        
-        # Get species distribution
-        cursor.execute('SELECT species_name, COUNT(*) FROM plankton_results GROUP BY species_name ORDER BY COUNT(*) DESC')
-        species_dist = cursor.fetchall()
-        
-        # Get detection distribution for microplastics
-        cursor.execute('SELECT detections FROM microplastic_results')
-        detection_data = cursor.fetchall()
-        
-        class_counts = {'fiber': 0, 'fragment': 0, 'pellet': 0, 'film': 0}
-        for row in detection_data:
-            try:
-                detections = json.loads(row[0])
-                for detection in detections.get('detections', []):
-                    class_name = detection.get('class_name', '')
-                    if class_name in class_counts:
-                        class_counts[class_name] += 1
-            except:
-                continue
-        
-        conn.close()
-        
-        return jsonify({
-            'microplastic_count': microplastic_count,
-            'plankton_count': plankton_count,
-            'species_distribution': dict(species_dist),
-            'microplastic_distribution': class_counts
-        })
-        
+        return jsonify(get_stats_data())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -351,17 +277,10 @@ def get_stats():
 def camera_stream():
     """Live camera feed endpoint"""
     def generate_frames():
-        while True:
-            frame = camera_manager.get_active_frame()
-            if frame is not None:
-                # Encode frame as JPEG
-                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                if ret:
-                    frame_bytes = buffer.tobytes()
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            else:
-                time.sleep(0.1)
+        # Frames are encoded once by the camera manager and shared by every client
+        for frame_bytes in camera_manager.jpeg_frames():
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
     
     return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
@@ -372,9 +291,9 @@ def camera_snapshot():
         frame = camera_manager.capture_snapshot()
         if frame is not None:
             # Encode as JPEG
-            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
-            if ret:
-                response = make_response(buffer.tobytes())
+            jpeg = encode_jpeg(frame, quality=95)
+            if jpeg is not None:
+                response = make_response(jpeg)
                 response.headers['Content-Type'] = 'image/jpeg'
                 response.headers['Content-Disposition'] = 'inline; filename=snapshot.jpg'
                 return response
@@ -469,29 +388,28 @@ def capture_from_camera():
         if frame is None:
             return jsonify({'error': 'No camera active or failed to capture'}), 400
         
-        # Save temporary image
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = _file_stamp()
         filename = f"camera_{analysis_type}_{timestamp}.jpg"
         image_path = os.path.join('uploads', filename)
         
-        os.makedirs('uploads', exist_ok=True)
-        cv2.imwrite(image_path, frame)
-        
-        # Run analysis based on type
+        # Run analysis based on type on the frame itself; the JPEG is only for the archive
         if analysis_type == 'microplastic':
-            result = microplastic_model.predict(image_path)
+            result = inference_pool.run(inference_pool.run_microplastic, frame)
             if result['success']:
-                save_microplastic_result(image_path, result['detections'], result['image_shape'])
+                save_microplastic_result(image_path, result['detections'], result['image_shape'],
+                                         result['timestamp'])
         elif analysis_type == 'plankton':
-            result = plankton_model.predict(image_path)
+            result = inference_pool.run(inference_pool.run_plankton, frame)
             if result['success']:
                 classification = result['classification']
                 save_plankton_result(image_path, classification['species_name'], 
-                                   classification['confidence'], result['segmentation_mask'], 
-                                   result['image_shape'])
+                                   classification['confidence'], result['segmentation_mask_url'], 
+                                   result['image_shape'], result['timestamp'])
         else:
             return jsonify({'error': 'Invalid analysis type'}), 400
         
+        # Written off the request path, like the database rows
+        _archive_executor.submit(cv2.imwrite, image_path, frame)
         result['image_path'] = image_path
         return jsonify(result)
         
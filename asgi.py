@@ -0,0 +1,68 @@
+"""
+ASGI entry point for Microbe Insights
+Serves /video_feed as a native async stream and mounts the Flask app for every other route
+Usage: uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import contextlib
+
+import anyio.to_thread
+from starlette.applications import Starlette
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from services.camera import frame_broadcaster
+from wsgi import application as flask_app
+
+# MJPEG multipart part header, built once instead of per frame
+_HDR = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+# Worker threads for the mounted Flask app; anyio's default of 40 throttles blocking routes
+THREAD_LIMIT = 300
+
+def _offer(queue: asyncio.Queue, jpeg: bytes):
+    """Put the newest frame, dropping the unsent one so slow clients skip ahead"""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(jpeg)
+
+async def video_feed(request):
+    """Live camera feed endpoint"""
+    if not frame_broadcaster.open_client():
+        return JSONResponse({'error': 'Too many live feed clients'}, status_code=503)
+    
+    loop = asyncio.get_running_loop()
+    frames = asyncio.Queue(maxsize=1)
+    
+    def on_frame(jpeg):
+        # Runs on the encoder thread; hand the frame over to the event loop
+        loop.call_soon_threadsafe(_offer, frames, jpeg)
+    
+    frame_broadcaster.add_listener(on_frame)
+    
+    async def generate_frames():
+        try:
+            while True:
+                jpeg = await frames.get()
+                yield _HDR + jpeg + b'\r\n'
+        finally:
+            frame_broadcaster.remove_listener(on_frame)
+            frame_broadcaster.close_client()
+    
+    return StreamingResponse(generate_frames(), media_type='multipart/x-mixed-replace; boundary=frame')
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Raise the thread limit used to run the WSGI app"""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREAD_LIMIT
+    yield
+
+application = Starlette(
+    routes=[
+        Route('/video_feed', video_feed),
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan,
+)
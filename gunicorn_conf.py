@@ -0,0 +1,37 @@
+"""
+Gunicorn configuration for Microbe Insights
+Usage: gunicorn -c gunicorn_conf.py wsgi:application
+The microscope dashboard (app/ package) uses the same settings:
+gunicorn -c gunicorn_conf.py 'app:create_app()'
+"""
+
+import os
+import sys
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Threaded workers: camera capture and frame encoding run in real OS threads that
+# block in cap.read() and the JPEG encoder, which would starve a gevent hub. Each
+# open /video_feed holds one thread, so keep well above STREAM_MAX_CLIENTS.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+
+# One worker owns the camera; camera and broadcaster state live in each worker
+# process, so extra workers would each try to open the same device. Set
+# GUNICORN_WORKERS to opt in to more.
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+
+# Import the app (and its heavy dependencies) once in the master; forked workers
+# share those pages copy-on-write. Models, cameras and database connections are
+# all created lazily, so nothing fork-unsafe is opened before the fork.
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+
+def post_fork(server, worker):
+    """Give each worker its own DB writer and inference pool instead of the master's"""
+    for name in ('app.database', 'app.inference_pool'):
+        module = sys.modules.get(name)
+        if module is not None:
+            module.reset_after_fork()
@@ -9,6 +9,7 @@ import os
 import sys
 import torch
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask
 from app import create_app
 
@@ -65,42 +66,31 @@ def load_models():
     logger.info("🤖 Loading ML models...")
     
     try:
-        # Import models to trigger loading
-        from app.models.microplastic_model import microplastic_model
-        from app.models.plankton_model import plankton_model
-        
-        logger.info("✅ Microplastic detection model loaded")
-        logger.info("✅ Plankton analysis model loaded")
+        # Requests run inference in the worker pool, so the models are built there;
+        # the first job starts the workers, whose initializer loads both models
+        import numpy as np
+        from app import inference_pool
         
-        # Test model inference (dummy test)
+        # Test model inference on an in-memory frame (no image file round-trip)
         logger.info("🧪 Testing model inference...")
+        dummy_frame = np.random.randint(0, 255, (224, 224, 3), dtype=np.uint8)
         
-        # Create a dummy image for testing
-        import numpy as np
-        from PIL import Image
-        
-        dummy_image = np.random.randint(0, 255, (224, 224, 3), dtype=np.uint8)
-        test_image = Image.fromarray(dummy_image)
-        test_path = "test_image.jpg"
-        test_image.save(test_path)
+        # No request timeout here: the first job also waits for the workers to start
+        executor = inference_pool.get_executor()
         
         # Test microplastic model
-        result = microplastic_model.predict(test_path)
+        result = executor.submit(inference_pool.run_microplastic, dummy_frame).result()
         if result['success']:
-            logger.info("✅ Microplastic model test passed")
+            logger.info("✅ Microplastic detection model loaded")
         else:
             logger.warning(f"⚠️ Microplastic model test failed: {result.get('error', 'Unknown error')}")
         
         # Test plankton model
-        result = plankton_model.predict(test_path)
+        result = executor.submit(inference_pool.run_plankton, dummy_frame).result()
         if result['success']:
-            logger.info("✅ Plankton model test passed")
+            logger.info("✅ Plankton analysis model loaded")
         else:
             logger.warning(f"⚠️ Plankton model test failed: {result.get('error', 'Unknown error')}")
-        
-        # Clean up test image
-        if os.path.exists(test_path):
-            os.remove(test_path)
             
     except Exception as e:
         logger.error(f"❌ Model loading failed: {str(e)}")
@@ -114,6 +104,18 @@ def setup_directories():
         os.makedirs(directory, exist_ok=True)
         logger.info(f"📁 Directory created/verified: {directory}")
 
+def run_gunicorn(host, port):
+    """Replace this process with gunicorn serving create_app() (production)"""
+    # Worker class, worker and thread counts all come from gunicorn_conf.py
+    args = ['gunicorn', '-c', 'gunicorn_conf.py', '-b', f'{host}:{port}']
+    
+    # Worker heartbeat files on tmpfs instead of the (possibly eMMC) disk
+    if os.path.isdir('/dev/shm'):
+        args += ['--worker-tmp-dir', '/dev/shm']
+    
+    logger.info(f"🚀 Starting gunicorn at http://{host}:{port}")
+    os.execvp('gunicorn', args + ['app:create_app()'])
+
 def main():
     """Main application entry point"""
     try:
@@ -123,17 +125,21 @@ def main():
         # Setup directories
         setup_directories()
         
-        # Load models
-        load_models()
-        
-        # Create Flask app
-        app = create_app()
-        
         # Configuration
         host = os.environ.get('FLASK_HOST', '0.0.0.0')
         port = int(os.environ.get('FLASK_PORT', 5000))
         debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
         
+        if os.environ.get('ENVIRONMENT') == 'production':
+            run_gunicorn(host, port)  # does not return
+        
+        # Create Flask app
+        app = create_app()
+        
+        # Load models in the background so the server binds its port right away;
+        # POST requests wait for the warmup once (see create_app)
+        app.config['MODEL_WARMUP'] = ThreadPoolExecutor(max_workers=1).submit(load_models)
+        
         logger.info(f"🚀 Starting Flask server...")
         logger.info(f"🌐 Server will be available at: http://{host}:{port}")
         logger.info(f"📊 Main dashboard: http://{host}:{port}/")
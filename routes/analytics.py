@@ -2,10 +2,12 @@
 Analytics route - Data visualization and statistics
 """
 
-from flask import Blueprint, render_template, jsonify
-from services.database import get_analytics_data, get_recent_reports
+from flask import Blueprint, render_template, jsonify, Response, current_app, stream_with_context
+from services.database import (get_analytics_data, get_shared_recent_reports, get_species_distribution,
+                               iter_recent_reports)
 from datetime import datetime, timedelta
-import json
+from collections import defaultdict
+import numpy as np
 
 bp = Blueprint('analytics', __name__)
 
@@ -19,11 +21,22 @@ def get_stats():
     """Get analytics statistics"""
     try:
         # Get recent reports for analysis
-        reports = get_recent_reports(limit=100)
+        reports = get_shared_recent_reports(limit=100)
         
-        # Calculate basic statistics
+        # Detection count and per-day totals in a single pass
         total_reports = len(reports)
-        microplastic_reports = sum(1 for r in reports if r.get('microplastics_present', False))
+        microplastic_reports = 0
+        by_day = defaultdict(lambda: [0, 0])  # 'YYYY-MM-DD' -> [reports, detections]
+        for report in reports:
+            day = by_day[report['timestamp'][:10]]
+            day[0] += 1
+            if report.get('microplastics_present', False):
+                microplastic_reports += 1
+                day[1] += 1
+        
+        # Species totals are summed by SQLite straight from the stored JSON
+        species_dist = get_species_distribution(limit=100)
+        
         detection_rate = (microplastic_reports / total_reports * 100) if total_reports > 0 else 0
         
         # Calculate average processing time (simulated)
@@ -32,27 +45,16 @@ def get_stats():
         # Calculate storage usage (simulated)
         storage_usage = total_reports * 2.5  # MB per report
         
-        # Get species distribution
-        species_dist = {}
-        for report in reports:
-            if report.get('plankton_summary'):
-                try:
-                    plankton_data = json.loads(report['plankton_summary'])
-                    if 'summary' in plankton_data:
-                        for species, count in plankton_data['summary'].items():
-                            species_dist[species] = species_dist.get(species, 0) + count
-                except:
-                    continue
-        
         # Get daily detection trends (last 7 days)
+        today = datetime.now()
         daily_trends = []
         for i in range(7):
-            date = datetime.now() - timedelta(days=i)
-            day_reports = [r for r in reports if r['timestamp'].startswith(date.strftime('%Y-%m-%d'))]
+            date = (today - timedelta(days=i)).strftime('%Y-%m-%d')
+            total, detections = by_day.get(date, (0, 0))
             daily_trends.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'total': len(day_reports),
-                'detections': sum(1 for r in day_reports if r.get('microplastics_present', False))
+                'date': date,
+                'total': total,
+                'detections': detections
             })
         
         return jsonify({
@@ -75,35 +77,25 @@ def get_stats():
 def get_charts_data():
     """Get data for charts"""
     try:
-        reports = get_recent_reports(limit=50)
+        reports = get_shared_recent_reports(limit=50)
         
-        # Microplastic type distribution
-        microplastic_types = {'fiber': 0, 'fragment': 0, 'pellet': 0, 'film': 0}
-        for report in reports:
-            if report.get('microplastics_present', False):
-                # Simulate type distribution based on count
-                count = report.get('particle_count', 0)
-                if count > 10:
-                    microplastic_types['fragment'] += 1
-                elif count > 5:
-                    microplastic_types['fiber'] += 1
-                elif count > 2:
-                    microplastic_types['pellet'] += 1
-                else:
-                    microplastic_types['film'] += 1
+        # Bucket both histograms with NumPy instead of per-report if/elif chains
+        present = np.fromiter((bool(r.get('microplastics_present', False)) for r in reports),
+                              dtype=bool, count=len(reports))
+        particle_counts = np.fromiter((r.get('particle_count') or 0 for r in reports),
+                                      dtype=np.int64, count=len(reports))
+        confidences = np.fromiter((r.get('confidence') or 0 for r in reports),
+                                  dtype=np.float64, count=len(reports))
+        
+        # Microplastic type distribution, simulated from the particle count:
+        # <=2 film, <=5 pellet, <=10 fiber, >10 fragment
+        types = np.bincount(np.digitize(particle_counts[present], [2, 5, 10], right=True), minlength=4)
+        microplastic_types = {'fiber': int(types[2]), 'fragment': int(types[3]),
+                              'pellet': int(types[1]), 'film': int(types[0])}
         
         # Confidence distribution
-        confidence_ranges = {'0-0.5': 0, '0.5-0.7': 0, '0.7-0.9': 0, '0.9-1.0': 0}
-        for report in reports:
-            confidence = report.get('confidence', 0)
-            if confidence < 0.5:
-                confidence_ranges['0-0.5'] += 1
-            elif confidence < 0.7:
-                confidence_ranges['0.5-0.7'] += 1
-            elif confidence < 0.9:
-                confidence_ranges['0.7-0.9'] += 1
-            else:
-                confidence_ranges['0.9-1.0'] += 1
+        ranges = np.bincount(np.digitize(confidences, [0.5, 0.7, 0.9]), minlength=4)
+        confidence_ranges = dict(zip(('0-0.5', '0.5-0.7', '0.7-0.9', '0.9-1.0'), map(int, ranges)))
         
         # Processing time trends (simulated)
         processing_times = [2.1, 2.3, 2.0, 2.4, 2.2, 2.5, 2.1, 2.6, 2.3, 2.2]
@@ -122,27 +114,45 @@ def get_charts_data():
 
 @bp.route('/analytics/api/export')
 def export_analytics():
-    """Export analytics data"""
-    try:
-        reports = get_recent_reports(limit=1000)
-        
-        # Generate summary data
-        summary = {
-            'export_date': datetime.now().isoformat(),
-            'total_reports': len(reports),
-            'date_range': {
-                'from': min(r['timestamp'] for r in reports) if reports else None,
-                'to': max(r['timestamp'] for r in reports) if reports else None
-            },
-            'microplastic_detection_rate': sum(1 for r in reports if r.get('microplastics_present', False)) / len(reports) * 100 if reports else 0,
-            'average_confidence': sum(r.get('confidence', 0) for r in reports) / len(reports) if reports else 0
-        }
+    """Export analytics data, streamed report by report"""
+    dumps = current_app.json.dumps
+    
+    def generate():
+        # Reports are written as they are read; the summary aggregates follow them, and
+        # "success" comes last so it reflects whether the whole document was written
+        first = last = None
+        total = detections = 0
+        confidence_total = 0
         
-        return jsonify({
-            'success': True,
-            'summary': summary,
-            'reports': reports
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        yield '{"reports": ['
+        try:
+            for report in iter_recent_reports(limit=1000):
+                timestamp = report['timestamp']
+                if first is None or timestamp < first:
+                    first = timestamp
+                if last is None or timestamp > last:
+                    last = timestamp
+                if report.get('microplastics_present', False):
+                    detections += 1
+                confidence_total += report.get('confidence', 0)
+                
+                yield (', ' if total else '') + dumps(report)
+                total += 1
+            
+            summary = {
+                'export_date': datetime.now().isoformat(),
+                'total_reports': total,
+                'date_range': {
+                    'from': first,
+                    'to': last
+                },
+                'microplastic_detection_rate': detections / total * 100 if total else 0,
+                'average_confidence': confidence_total / total if total else 0
+            }
+            yield '], "summary": ' + dumps(summary) + ', "success": true}'
+        except Exception as e:
+            current_app.logger.exception("Analytics export failed")
+            # Headers are already sent; close the document with the error instead
+            yield '], "success": false, "error": ' + dumps(str(e)) + '}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -2,17 +2,47 @@
 Capture route - 7-step workflow for sample analysis
 """
 
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, Response
 import os
-import uuid
-from datetime import datetime
-from services.camera import camera_manager
+import json
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from services.camera import camera_manager, save_snapshot
 from services.database import create_report
 from services.model_microplastics import analyze_microplastics
 from services.model_plankton import classify_plankton
 
 bp = Blueprint('capture', __name__)
 
+# Snapshot writes, kept off the request thread
+_io_executor = ThreadPoolExecutor(max_workers=2)
+
+# The two analyses of a capture run side by side; model code releases the GIL
+_analysis_executor = ThreadPoolExecutor(max_workers=2)
+
+# Analysis progress by the client-chosen progress_id, streamed by get_progress;
+# only the most recent MAX_TRACKED_PROGRESS analyses are kept
+MAX_TRACKED_PROGRESS = 100
+_progress = OrderedDict()
+_progress_cond = threading.Condition()
+
+def _set_progress(progress_id, progress, status):
+    """Record an analysis step and wake the progress streams"""
+    if not progress_id:
+        return
+    with _progress_cond:
+        _progress[progress_id] = (progress, status)
+        _progress.move_to_end(progress_id)
+        while len(_progress) > MAX_TRACKED_PROGRESS:
+            _progress.popitem(last=False)
+        _progress_cond.notify_all()
+
+# Step 4 form fields and their error messages
+REQUIRED_FIELDS = ('slide_name', 'location', 'user')
+REQUIRED_FIELD_ERRORS = {field: f"{field.replace('_', ' ').title()} is required" for field in REQUIRED_FIELDS}
+
 @bp.route('/capture')
 def capture():
     """Capture page with 7-step workflow"""
@@ -31,12 +61,7 @@ def validate_form():
     """Validate form data from step 4"""
     data = request.get_json()
     
-    required_fields = ['slide_name', 'location', 'user']
-    errors = []
-    
-    for field in required_fields:
-        if not data.get(field):
-            errors.append(f"{field.replace('_', ' ').title()} is required")
+    errors = [REQUIRED_FIELD_ERRORS[field] for field in REQUIRED_FIELDS if not data.get(field)]
     
     if errors:
         return jsonify({'valid': False, 'errors': errors})
@@ -57,25 +82,29 @@ def preview_capture():
 
 @bp.route('/capture/api/process', methods=['POST'])
 def process_analysis():
-    """Process analysis with fake progress bar"""
+    """Process analysis, reporting progress under the optional progress_id"""
+    data = request.get_json() or {}
+    progress_id = data.get('progress_id')
     try:
-        data = request.get_json()
-        
         # Capture frame from camera
         frame = camera_manager.capture_snapshot()
         if frame is None:
+            _set_progress(progress_id, 100, 'Failed to capture frame')
             return jsonify({'error': 'Failed to capture frame'}), 400
+        _set_progress(progress_id, 10, 'Analyzing...')
         
-        # Save captured image
-        import cv2
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"capture_{timestamp}.jpg"
+        # Save captured image; nanosecond names are unique even for captures within one second
+        filename = f"capture_{time.time_ns()}.jpg"
         filepath = os.path.join('data/captures', filename)
-        cv2.imwrite(filepath, frame)
+        _io_executor.submit(save_snapshot, frame, filepath)
         
-        # Run analysis
-        microplastic_result = analyze_microplastics(frame)
-        plankton_result = classify_plankton(frame)
+        # Run both analyses at once; the JPEG is written in the background meanwhile
+        microplastic_future = _analysis_executor.submit(analyze_microplastics, frame)
+        plankton_future = _analysis_executor.submit(classify_plankton, frame)
+        microplastic_result = microplastic_future.result()
+        _set_progress(progress_id, 50, 'Microplastic analysis complete')
+        plankton_result = plankton_future.result()
+        _set_progress(progress_id, 90, 'Plankton analysis complete')
         
         # Create report
         report_id = create_report(
@@ -86,6 +115,7 @@ def process_analysis():
             plankton_result=plankton_result,
             image_path=filepath
         )
+        _set_progress(progress_id, 100, 'Complete')
         
         return jsonify({
             'success': True,
@@ -95,17 +125,30 @@ def process_analysis():
         })
         
     except Exception as e:
+        _set_progress(progress_id, 100, f'Failed: {e}')
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/capture/api/progress/<report_id>')
 def get_progress(report_id):
-    """Get processing progress (fake progress bar)"""
-    # Simulate progress
-    import time
-    progress = min(100, int(time.time() * 10) % 100)
+    """Stream the progress of the analysis started with progress_id=report_id as server-sent events"""
+    def stream():
+        last = None
+        while True:
+            with _progress_cond:
+                _progress_cond.wait_for(lambda: _progress.get(report_id) != last, timeout=30)
+                current = _progress.get(report_id)
+            
+            if current is None:
+                return  # not started within the timeout, or already evicted
+            if current == last:
+                yield ': keep-alive\n\n'
+                continue
+            
+            last = current
+            progress, status = current
+            yield f"data: {json.dumps({'progress': progress, 'status': status, 'completed': progress >= 100})}\n\n"
+            if progress >= 100:
+                return
     
-    return jsonify({
-        'progress': progress,
-        'status': 'Processing...' if progress < 100 else 'Complete',
-        'completed': progress >= 100
-    })
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
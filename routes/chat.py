@@ -4,11 +4,53 @@ AI Lab route - Chat interface for AI assistance
 
 from flask import Blueprint, render_template, request, jsonify
 import os
+import time
 from werkzeug.utils import secure_filename
 from datetime import datetime
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 bp = Blueprint('chat', __name__)
 
+UPLOAD_BUFFER_SIZE = 1 << 20
+
+# Simple AI response simulation: the first keyword (in this order) found in the message wins
+RESPONSES = {
+    'microplastic': 'Based on the analysis, I can help you understand microplastic detection patterns. Microplastics are typically classified into fibers, fragments, pellets, and films.',
+    'plankton': 'I can assist with plankton classification. Common plankton types include diatoms, dinoflagellates, copepods, and various larval forms.',
+    'analysis': 'For detailed analysis, I recommend checking the Analytics page for comprehensive statistics and trends.',
+    'help': 'I\'m here to help with microscopy analysis questions. Ask me about microplastics, plankton classification, or data interpretation.'
+}
+DEFAULT_RESPONSE = "I understand you're working with microscopy data. How can I help you with microplastic detection or plankton analysis?"
+
+# Lowercased (keyword, reply) pairs in priority order, for the fallback scan
+_RESPONSE_ITEMS = tuple((keyword.lower(), reply) for keyword, reply in RESPONSES.items())
+
+# Aho-Corasick automaton over all keywords, built once: one pass over the message
+# regardless of how many keywords there are. Values carry the keyword's priority.
+if ahocorasick is not None:
+    _keyword_automaton = ahocorasick.Automaton()
+    for priority, (keyword, reply) in enumerate(_RESPONSE_ITEMS):
+        _keyword_automaton.add_word(keyword, (priority, reply))
+    _keyword_automaton.make_automaton()
+else:
+    _keyword_automaton = None
+
+def match_response(message):
+    """Return the reply for the highest-priority keyword in message, or the default reply"""
+    message = message.lower()
+    if _keyword_automaton is not None:
+        match = min((value for _, value in _keyword_automaton.iter(message)), default=None)
+        return match[1] if match else DEFAULT_RESPONSE
+    
+    for keyword, reply in _RESPONSE_ITEMS:
+        if keyword in message:
+            return reply
+    return DEFAULT_RESPONSE
+
 @bp.route('/chat')
 def chat():
     """AI Lab chat page"""
@@ -22,21 +64,8 @@ def chat_api():
         message = data.get('message', '')
         file_data = data.get('file_data')
         
-        # Simple AI response simulation
-        responses = {
-            'microplastic': 'Based on the analysis, I can help you understand microplastic detection patterns. Microplastics are typically classified into fibers, fragments, pellets, and films.',
-            'plankton': 'I can assist with plankton classification. Common plankton types include diatoms, dinoflagellates, copepods, and various larval forms.',
-            'analysis': 'For detailed analysis, I recommend checking the Analytics page for comprehensive statistics and trends.',
-            'help': 'I\'m here to help with microscopy analysis questions. Ask me about microplastics, plankton classification, or data interpretation.'
-        }
-        
         # Simple keyword-based response
-        response = "I understand you're working with microscopy data. How can I help you with microplastic detection or plankton analysis?"
-        
-        for keyword, reply in responses.items():
-            if keyword.lower() in message.lower():
-                response = reply
-                break
+        response = match_response(message)
         
         return jsonify({
             'success': True,
@@ -60,14 +89,12 @@ def upload_file():
         
         if file:
             filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             name, ext = os.path.splitext(filename)
-            unique_filename = f"{name}_{timestamp}{ext}"
+            unique_filename = f"{name}_{time.time_ns()}{ext}"
             
-            # Save file to uploads directory
-            os.makedirs('data/uploads', exist_ok=True)
+            # Save file to uploads directory (created by create_app), copying in 1 MiB chunks
             filepath = os.path.join('data/uploads', unique_filename)
-            file.save(filepath)
+            file.save(filepath, buffer_size=UPLOAD_BUFFER_SIZE)
             
             return jsonify({
                 'success': True,
@@ -2,7 +2,9 @@
 Help route - Documentation and support information
 """
 
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, jsonify, request, Response
+import json
+import hashlib
 
 bp = Blueprint('help', __name__)
 
@@ -201,6 +203,20 @@ HELP_SECTIONS = {
     }
 }
 
+# Lowercased title/content and the result snippet of every section, built once
+# so search_help does not re-lower the HTML on each query
+_SEARCH_INDEX = [
+    (section_name, section_data['title'], section_data['title'].lower(), section_data['content'].lower(),
+     section_data['content'][:200] + '...' if len(section_data['content']) > 200 else section_data['content'])
+    for section_name, section_data in HELP_SECTIONS.items()
+]
+
+# Section API responses are static: encode each once, with an ETag for 304s
+_SECTION_JSON = {}
+for section_name, section_data in HELP_SECTIONS.items():
+    body = json.dumps({'success': True, 'section': section_data}).encode()
+    _SECTION_JSON[section_name] = (body, hashlib.blake2b(body, digest_size=8).hexdigest())
+
 @bp.route('/help')
 def help():
     """Help page with documentation"""
@@ -209,11 +225,12 @@ def help():
 @bp.route('/help/api/section/<section_name>')
 def get_help_section(section_name):
     """API endpoint to get specific help section"""
-    if section_name in HELP_SECTIONS:
-        return jsonify({
-            'success': True,
-            'section': HELP_SECTIONS[section_name]
-        })
+    if section_name in _SECTION_JSON:
+        body, etag = _SECTION_JSON[section_name]
+        response = Response(body, mimetype='application/json',
+                            headers={'Cache-Control': 'public, max-age=3600'})
+        response.set_etag(etag)
+        return response.make_conditional(request)
     else:
         return jsonify({'error': 'Section not found'}), 404
 
@@ -225,15 +242,12 @@ def search_help():
         if not query:
             return jsonify({'results': []})
         
-        results = []
-        for section_name, section_data in HELP_SECTIONS.items():
-            if (query in section_data['title'].lower() or 
-                query in section_data['content'].lower()):
-                results.append({
-                    'section': section_name,
-                    'title': section_data['title'],
-                    'content': section_data['content'][:200] + '...' if len(section_data['content']) > 200 else section_data['content']
-                })
+        results = [{
+            'section': section_name,
+            'title': title,
+            'content': snippet
+        } for section_name, title, title_lower, content_lower, snippet in _SEARCH_INDEX
+            if query in title_lower or query in content_lower]
         
         return jsonify({
             'success': True,
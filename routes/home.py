@@ -2,24 +2,32 @@
 Home route - Main dashboard page
 """
 
-from flask import Blueprint, render_template, jsonify
-from services.database import get_recent_reports
+from flask import Blueprint, render_template, jsonify, request
+from services.database import get_shared_recent_reports
 
 bp = Blueprint('home', __name__)
 
+def _count_analyses(reports):
+    """Count reports with microplastics and with a plankton summary in one pass"""
+    microplastic_detections = plankton_analyses = 0
+    for report in reports:
+        if report.get('microplastics_present', False):
+            microplastic_detections += 1
+        if report.get('plankton_summary'):
+            plankton_analyses += 1
+    return microplastic_detections, plankton_analyses
+
 @bp.route('/')
 def home():
     """Main dashboard page"""
     # Get recent reports for dashboard stats
-    reports = get_recent_reports(limit=10)
+    reports = get_shared_recent_reports(limit=10)
     
     # Calculate statistics
-    total_reports = len(reports)
-    microplastic_detections = sum(1 for r in reports if r.get('microplastics_present', False))
-    plankton_analyses = sum(1 for r in reports if r.get('plankton_summary'))
+    microplastic_detections, plankton_analyses = _count_analyses(reports)
     
     stats = {
-        'total_reports': total_reports,
+        'total_reports': len(reports),
         'microplastic_detections': microplastic_detections,
         'plankton_analyses': plankton_analyses,
         'recent_reports': reports[:5]  # Show 5 most recent
@@ -30,13 +38,24 @@ def home():
 @bp.route('/api/dashboard_stats')
 def dashboard_stats():
     """API endpoint for dashboard statistics"""
-    reports = get_recent_reports(limit=50)
+    reports = get_shared_recent_reports(limit=50)
+    
+    microplastic_detections, plankton_analyses = _count_analyses(reports)
+    
+    # The payload is fully determined by these values, so repeat polls can be answered with a 304
+    latest_id = reports[0]['id'] if reports else 0
+    etag = f'{latest_id}-{len(reports)}-{microplastic_detections}-{plankton_analyses}'
+    if etag in request.if_none_match:
+        return '', 304, {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
     
     stats = {
         'total_reports': len(reports),
-        'microplastic_detections': sum(1 for r in reports if r.get('microplastics_present', False)),
-        'plankton_analyses': sum(1 for r in reports if r.get('plankton_summary')),
+        'microplastic_detections': microplastic_detections,
+        'plankton_analyses': plankton_analyses,
         'last_analysis': reports[0].get('timestamp') if reports else None
     }
     
-    return jsonify(stats)
+    response = jsonify(stats)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -2,45 +2,36 @@
 Reports route - View and filter analysis reports
 """
 
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for
-from services.database import get_recent_reports, get_report_by_id, search_reports
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, Response, stream_with_context
+import csv
+import io
+from operator import itemgetter
+from services.database import get_report_by_id, search_reports, get_reports_page
 
 bp = Blueprint('reports', __name__)
 
 @bp.route('/reports')
 def reports():
-    """Reports listing page"""
+    """Reports listing page, paged by id cursor (?after_id=<last id shown> or ?before_id=<first id shown>)"""
     # Get filter parameters
-    page = request.args.get('page', 1, type=int)
+    after_id = request.args.get('after_id', type=int)
+    before_id = request.args.get('before_id', type=int)
     per_page = request.args.get('per_page', 20, type=int)
     search_term = request.args.get('search', '')
     date_from = request.args.get('date_from', '')
     date_to = request.args.get('date_to', '')
     
-    # Get reports based on filters
-    if search_term or date_from or date_to:
-        reports = search_reports(
-            search_term=search_term,
-            date_from=date_from,
-            date_to=date_to,
-            limit=per_page,
-            offset=(page - 1) * per_page
-        )
-        total_count = len(search_reports(search_term, date_from, date_to))
-    else:
-        reports = get_recent_reports(limit=per_page, offset=(page - 1) * per_page)
-        total_count = len(get_recent_reports(limit=1000))  # Get total count
-    
-    # Calculate pagination
-    total_pages = (total_count + per_page - 1) // per_page
+    reports, has_prev, has_next, total_count = get_reports_page(after_id, per_page, search_term,
+                                                                date_from, date_to, before_id)
     
     pagination = {
-        'page': page,
         'per_page': per_page,
-        'total_pages': total_pages,
         'total_count': total_count,
-        'has_prev': page > 1,
-        'has_next': page < total_pages
+        'after_id': after_id,
+        'has_prev': has_prev,
+        'has_next': has_next,
+        'prev_cursor': reports[0]['id'] if has_prev and reports else None,
+        'next_cursor': reports[-1]['id'] if has_next else None
     }
     
     return render_template('reports.html', 
@@ -80,43 +71,38 @@ def api_search():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# (label, column) rows of a report CSV export
+CSV_EXPORT_FIELDS = (
+    ('ID', 'id'),
+    ('Slide Name', 'slide_name'),
+    ('Location', 'location'),
+    ('User', 'user'),
+    ('Timestamp', 'timestamp'),
+    ('Microplastics Present', 'microplastics_present'),
+    ('Particle Count', 'particle_count'),
+    ('Confidence', 'confidence'),
+    ('Plankton Summary', 'plankton_summary'),
+)
+CSV_EXPORT_LABELS = tuple(label for label, _ in CSV_EXPORT_FIELDS)
+_csv_export_values = itemgetter(*(column for _, column in CSV_EXPORT_FIELDS))
+
 @bp.route('/reports/api/export/<int:report_id>')
 def export_report(report_id):
-    """Export report as CSV"""
+    """Export report as a CSV download, streamed row by row"""
     try:
         report = get_report_by_id(report_id)
         if not report:
             return jsonify({'error': 'Report not found'}), 404
         
-        # Generate CSV content
-        import csv
-        import io
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write headers
-        writer.writerow(['Field', 'Value'])
-        
-        # Write data
-        writer.writerow(['ID', report['id']])
-        writer.writerow(['Slide Name', report['slide_name']])
-        writer.writerow(['Location', report['location']])
-        writer.writerow(['User', report['user']])
-        writer.writerow(['Timestamp', report['timestamp']])
-        writer.writerow(['Microplastics Present', report['microplastics_present']])
-        writer.writerow(['Particle Count', report['particle_count']])
-        writer.writerow(['Confidence', report['confidence']])
-        writer.writerow(['Plankton Summary', report['plankton_summary']])
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(('Field', 'Value'))
+            writer.writerows(zip(CSV_EXPORT_LABELS, _csv_export_values(report)))
+            yield buffer.getvalue()
         
-        csv_content = output.getvalue()
-        output.close()
-        
-        return jsonify({
-            'success': True,
-            'csv_content': csv_content,
-            'filename': f"report_{report_id}.csv"
-        })
+        return Response(stream_with_context(generate()), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename=report_{report_id}.csv'})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -2,9 +2,27 @@
 Settings route - Application configuration and preferences
 """
 
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, make_response, current_app
 import os
+import copy
+import hashlib
 import json
+import threading
+from datetime import datetime
+
+# orjson parses and pretty-prints the settings file in native code; stdlib json otherwise
+try:
+    import orjson
+    
+    def dumps_settings(settings) -> bytes:
+        return orjson.dumps(settings, option=orjson.OPT_INDENT_2)
+    
+    loads_settings = orjson.loads
+except ImportError:
+    def dumps_settings(settings) -> bytes:
+        return json.dumps(settings, indent=2).encode()
+    
+    loads_settings = json.loads
 
 bp = Blueprint('settings', __name__)
 
@@ -34,137 +52,190 @@ DEFAULT_SETTINGS = {
     }
 }
 
+# Per-section form fields: settings path -> (request key, default)
+SETTINGS_SCHEMA = {
+    'camera': {
+        'message': 'Camera settings updated',
+        'fields': {
+            'resolution.width': ('width', 1280),
+            'resolution.height': ('height', 720),
+            'fps': ('fps', 30),
+            'exposure': ('exposure', 0),
+            'brightness': ('brightness', 0),
+            'contrast': ('contrast', 0)
+        }
+    },
+    'models': {
+        'message': 'Model settings updated',
+        'fields': {
+            'microplastic_version': ('microplastic_version', 'v1.0'),
+            'plankton_version': ('plankton_version', 'v1.0'),
+            'confidence_threshold': ('confidence_threshold', 0.7)
+        }
+    },
+    'cloud': {
+        'message': 'Cloud settings updated',
+        'fields': {
+            'sync_enabled': ('sync_enabled', False),
+            'auto_upload': ('auto_upload', False),
+            'compression': ('compression', True)
+        }
+    },
+    'system': {
+        'message': 'System settings updated',
+        'fields': {
+            'auto_save': ('auto_save', True),
+            'backup_enabled': ('backup_enabled', True),
+            'notifications': ('notifications', True)
+        }
+    }
+}
+
+SETTINGS_FILE = 'data/settings.json'
+
+# Parsed and merged settings, keyed by the file's (mtime, size) so edits are picked up
+_settings_cache = {'key': None, 'data': None}
+
+# Serializes writers with each other and with cache refreshes in load_settings
+_settings_lock = threading.Lock()
+
 def load_settings():
-    """Load settings from file"""
-    settings_file = 'data/settings.json'
-    if os.path.exists(settings_file):
+    """Load settings from file; callers get their own copy they may modify"""
+    with _settings_lock:
         try:
-            with open(settings_file, 'r') as f:
-                settings = json.load(f)
-                # Merge with defaults for any missing keys
-                return merge_settings(DEFAULT_SETTINGS, settings)
-        except:
-            pass
-    return DEFAULT_SETTINGS.copy()
+            stat = os.stat(SETTINGS_FILE)
+        except OSError:
+            return copy.deepcopy(DEFAULT_SETTINGS)
+        
+        key = (stat.st_mtime_ns, stat.st_size)
+        if _settings_cache['key'] != key:
+            try:
+                with open(SETTINGS_FILE, 'rb') as f:
+                    settings = loads_settings(f.read())
+                    # Merge with defaults for any missing keys
+                    data = merge_settings(DEFAULT_SETTINGS, settings)
+            except:
+                data = DEFAULT_SETTINGS
+            _settings_cache['data'] = data
+            _settings_cache['key'] = key
+        return copy.deepcopy(_settings_cache['data'])
 
 def save_settings(settings):
-    """Save settings to file"""
-    os.makedirs('data', exist_ok=True)
-    settings_file = 'data/settings.json'
-    try:
-        with open(settings_file, 'w') as f:
-            json.dump(settings, f, indent=2)
-        return True
-    except:
-        return False
+    """Atomically write settings to disk; returns True once they are there"""
+    with _settings_lock:
+        os.makedirs('data', exist_ok=True)
+        tmp_path = SETTINGS_FILE + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(dumps_settings(settings))
+            # Readers see either the old file or the new one, never a partial write
+            os.replace(tmp_path, SETTINGS_FILE)
+            return True
+        except:
+            return False
+        finally:
+            _settings_cache['key'] = None
+
+def apply_section(section_settings, fields, data):
+    """Copy request values (or their defaults) into a settings section"""
+    for path, (field, default) in fields.items():
+        target = section_settings
+        *parents, leaf = path.split('.')
+        for part in parents:
+            target = target[part]
+        target[leaf] = data.get(field, default)
+
+def _flatten(settings):
+    """Flatten nested dicts into {(key, subkey, ...): leaf value}"""
+    flat = {}
+    stack = [((), settings)]
+    while stack:
+        prefix, node = stack.pop()
+        for key, value in node.items():
+            path = prefix + (key,)
+            if isinstance(value, dict) and value:
+                stack.append((path, value))
+            else:
+                flat[path] = value
+    return flat
+
+def _unflatten(flat):
+    """Rebuild nested dicts from a flattened mapping"""
+    result = {}
+    for path, value in flat.items():
+        target = result
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = value
+    return result
+
+_DEFAULT_FLAT = _flatten(DEFAULT_SETTINGS)
 
 def merge_settings(default, user):
     """Merge user settings with defaults"""
-    result = default.copy()
-    for key, value in user.items():
-        if key in result and isinstance(value, dict) and isinstance(result[key], dict):
-            result[key] = merge_settings(result[key], value)
-        else:
-            result[key] = value
+    result = _unflatten(_DEFAULT_FLAT if default is DEFAULT_SETTINGS else _flatten(default))
+    
+    # Descend only where both sides are dicts; anything else replaces the default outright
+    stack = [(result, user)]
+    while stack:
+        target, overrides = stack.pop()
+        for key, value in overrides.items():
+            if key in target and isinstance(value, dict) and isinstance(target[key], dict):
+                stack.append((target[key], value))
+            else:
+                target[key] = value
     return result
 
+# Templates the settings page is rendered from; editing either changes its ETag
+SETTINGS_TEMPLATES = ('settings.html', 'base.html')
+
+def _template_version():
+    """Template modification times and enabled blueprints, so a deploy invalidates cached pages"""
+    folder = os.path.join(current_app.root_path, current_app.template_folder)
+    mtimes = [str(os.stat(os.path.join(folder, name)).st_mtime_ns) for name in SETTINGS_TEMPLATES]
+    return ','.join(mtimes + list(current_app.config.get('ENABLED_BLUEPRINTS', ())))
+
 @bp.route('/settings')
 def settings():
     """Settings page"""
     current_settings = load_settings()
-    return render_template('settings.html', settings=current_settings)
+    
+    # Skip rendering when the browser already has the page for these exact settings and templates
+    digest = hashlib.blake2b(dumps_settings(current_settings), digest_size=16)
+    digest.update(_template_version().encode())
+    etag = digest.hexdigest()
+    if etag in request.if_none_match:
+        return '', 304, {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    
+    response = make_response(render_template('settings.html', settings=current_settings))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
-@bp.route('/settings/camera', methods=['POST'])
-def update_camera_settings():
-    """Update camera settings"""
+@bp.route('/settings/<section>', methods=['POST'])
+def update_settings(section):
+    """Update one settings section, or reset everything to defaults"""
     try:
-        settings = load_settings()
-        
-        data = request.get_json()
-        settings['camera']['resolution']['width'] = data.get('width', 1280)
-        settings['camera']['resolution']['height'] = data.get('height', 720)
-        settings['camera']['fps'] = data.get('fps', 30)
-        settings['camera']['exposure'] = data.get('exposure', 0)
-        settings['camera']['brightness'] = data.get('brightness', 0)
-        settings['camera']['contrast'] = data.get('contrast', 0)
-        
-        if save_settings(settings):
-            return jsonify({'success': True, 'message': 'Camera settings updated'})
-        else:
-            return jsonify({'error': 'Failed to save settings'}), 500
-            
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@bp.route('/settings/models', methods=['POST'])
-def update_model_settings():
-    """Update model settings"""
-    try:
-        settings = load_settings()
+        if section == 'reset':
+            if save_settings(DEFAULT_SETTINGS):
+                return jsonify({'success': True, 'message': 'Settings reset to defaults'})
+            return jsonify({'error': 'Failed to reset settings'}), 500
         
-        data = request.get_json()
-        settings['models']['microplastic_version'] = data.get('microplastic_version', 'v1.0')
-        settings['models']['plankton_version'] = data.get('plankton_version', 'v1.0')
-        settings['models']['confidence_threshold'] = data.get('confidence_threshold', 0.7)
+        schema = SETTINGS_SCHEMA.get(section)
+        if schema is None:
+            return jsonify({'error': f'Unknown settings section: {section}'}), 404
         
-        if save_settings(settings):
-            return jsonify({'success': True, 'message': 'Model settings updated'})
-        else:
-            return jsonify({'error': 'Failed to save settings'}), 500
-            
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@bp.route('/settings/cloud', methods=['POST'])
-def update_cloud_settings():
-    """Update cloud sync settings"""
-    try:
         settings = load_settings()
-        
-        data = request.get_json()
-        settings['cloud']['sync_enabled'] = data.get('sync_enabled', False)
-        settings['cloud']['auto_upload'] = data.get('auto_upload', False)
-        settings['cloud']['compression'] = data.get('compression', True)
+        apply_section(settings[section], schema['fields'], request.get_json() or {})
         
         if save_settings(settings):
-            return jsonify({'success': True, 'message': 'Cloud settings updated'})
+            return jsonify({'success': True, 'message': schema['message']})
         else:
             return jsonify({'error': 'Failed to save settings'}), 500
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/settings/system', methods=['POST'])
-def update_system_settings():
-    """Update system settings"""
-    try:
-        settings = load_settings()
-        
-        data = request.get_json()
-        settings['system']['auto_save'] = data.get('auto_save', True)
-        settings['system']['backup_enabled'] = data.get('backup_enabled', True)
-        settings['system']['notifications'] = data.get('notifications', True)
-        
-        if save_settings(settings):
-            return jsonify({'success': True, 'message': 'System settings updated'})
-        else:
-            return jsonify({'error': 'Failed to save settings'}), 500
-            
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@bp.route('/settings/reset', methods=['POST'])
-def reset_settings():
-    """Reset all settings to defaults"""
-    try:
-        if save_settings(DEFAULT_SETTINGS):
-            return jsonify({'success': True, 'message': 'Settings reset to defaults'})
-        else:
-            return jsonify({'error': 'Failed to reset settings'}), 500
-            
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
 @bp.route('/settings/export', methods=['GET'])
 def export_settings():
     """Export settings as JSON"""
@@ -6,12 +6,87 @@ Handles CSI camera streaming with GStreamer and OpenCV
 import cv2
 import threading
 import time
+import queue
 import numpy as np
 from typing import Optional, Tuple, Callable
 import logging
 
 logger = logging.getLogger(__name__)
 
+# libjpeg-turbo encoder (SIMD colour conversion + DCT); falls back to OpenCV
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_420
+    _tj = TurboJPEG()
+except (ImportError, OSError) as e:  # OSError: libturbojpeg shared library missing
+    logger.warning(f"TurboJPEG unavailable, using OpenCV JPEG encoder: {e}")
+    _tj = None
+
+def encode_jpeg(frame: np.ndarray, quality: int = 80) -> Optional[bytes]:
+    """Encode a BGR frame as baseline JPEG (4:2:0, no optimized Huffman pass)"""
+    if _tj is not None:
+        return _tj.encode(frame, quality=quality, jpeg_subsample=TJSAMP_420, flags=0)
+    
+    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality,
+                                               cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+                                               cv2.IMWRITE_JPEG_PROGRESSIVE, 0])
+    return buffer.tobytes() if ret else None
+
+_nvjpeg = None  # (torch, torchvision) once probed, False when unavailable
+_pinned = None  # Reused page-locked staging buffer for host-to-device copies
+_pinned_lock = threading.Lock()
+
+def _nvjpeg_modules():
+    """Import torch/torchvision on first use and report whether nvJPEG encoding is possible"""
+    global _nvjpeg
+    if _nvjpeg is None:
+        try:
+            import torch
+            import torchvision
+            _nvjpeg = (torch, torchvision) if torch.cuda.is_available() else False
+        except ImportError:
+            _nvjpeg = False
+    return _nvjpeg
+
+def encode_jpeg_nvjpeg(frame: np.ndarray, quality: int = 80) -> Optional[bytes]:
+    """Encode a BGR frame with nvJPEG on the GPU; returns None when CUDA is unavailable or the encode fails"""
+    global _pinned
+    modules = _nvjpeg_modules()
+    if not modules:
+        return None
+    
+    torch, torchvision = modules
+    try:
+        # The staging buffer is shared, so hold the lock until the encode has consumed it
+        with _pinned_lock:
+            if _pinned is None or tuple(_pinned.shape) != frame.shape:
+                _pinned = torch.empty(frame.shape, dtype=torch.uint8, pin_memory=True)
+            _pinned.numpy()[...] = frame
+            
+            # HWC BGR -> CHW RGB on the device
+            image = _pinned.to('cuda', non_blocking=True).permute(2, 0, 1).flip(0)
+            jpeg = torchvision.io.encode_jpeg(image, quality=quality).cpu()
+        return jpeg.numpy().tobytes()
+    except Exception as e:
+        logger.warning(f"nvJPEG encode failed, using CPU encoder: {e}")
+        return None
+
+def save_snapshot(frame: np.ndarray, filepath: str, quality: int = 95) -> bool:
+    """Write a BGR frame to disk as JPEG, encoding with nvJPEG on the GPU when CUDA is present, else TurboJPEG"""
+    jpeg = encode_jpeg_nvjpeg(frame, quality)
+    if jpeg is None:
+        jpeg = encode_jpeg(frame, quality)
+    if jpeg is None:
+        return False
+    with open(filepath, 'wb') as f:
+        f.write(jpeg)
+    return True
+
+# Let GStreamer drop stale buffers so only the newest frame reaches cap.read()
+APPSINK = "appsink drop=true max-buffers=1 sync=false emit-signals=false"
+
+# Consecutive failed reads (0.1s apart) before the capture thread gives up the device
+MAX_READ_FAILURES = 50
+
 class GStreamerCamera:
     """GStreamer-based camera interface with real-time capture capabilities"""
     
@@ -20,7 +95,10 @@ class GStreamerCamera:
                  width: int = 1280,
                  height: int = 720,
                  fps: int = 30,
-                 camera_type: str = "usb"):
+                 camera_type: str = "usb",
+                 preprocessed_width: Optional[int] = None,
+                 preprocessed_height: Optional[int] = None,
+                 preprocessed_format: str = "BGR"):
         """
         Initialize GStreamer camera
         
@@ -30,6 +108,9 @@ class GStreamerCamera:
             height: Video height  
             fps: Frames per second
             camera_type: Type of camera ("usb", "csi", "ip")
+            preprocessed_width: Width of frames handed to Python (defaults to width)
+            preprocessed_height: Height of frames handed to Python (defaults to height)
+            preprocessed_format: Pixel format of frames handed to Python ("BGR" or "RGB")
         """
         self.camera_id = camera_id
         self.width = width
@@ -37,10 +118,17 @@ class GStreamerCamera:
         self.fps = fps
         self.camera_type = camera_type
         
+        # Scaling and colour conversion happen inside the pipeline, so frames
+        # arrive already in the layout the models consume
+        self.preprocessed_width = preprocessed_width or width
+        self.preprocessed_height = preprocessed_height or height
+        self.preprocessed_format = preprocessed_format
+        
         self.cap = None
         self.is_streaming = False
         self.latest_frame = None
-        self.frame_lock = threading.Lock()
+        self.frame_count = 0  # Incremented for every new frame
+        self.frame_ready = threading.Event()  # Set by the capture thread on every new frame
         self.capture_thread = None
         
         # Frame processing callback
@@ -49,25 +137,27 @@ class GStreamerCamera:
     def _get_gstreamer_pipeline(self) -> str:
         """Generate GStreamer pipeline based on camera type"""
         
+        out_w, out_h = self.preprocessed_width, self.preprocessed_height
+        out_caps = f"video/x-raw, width={out_w}, height={out_h}, format={self.preprocessed_format}"
+        
         if self.camera_type == "csi":
-            # CSI camera pipeline for Jetson Nano
+            # CSI camera pipeline for Jetson Nano; nvvidconv scales on the VIC block
             pipeline = (
                 f"nvarguscamerasrc sensor-id={self.camera_id} ! "
                 f"video/x-raw(memory:NVMM), width={self.width}, height={self.height}, "
                 f"format=NV12, framerate={self.fps}/1 ! "
                 f"nvvidconv flip-method=0 ! "
-                f"video/x-raw, width={self.width}, height={self.height}, format=BGRx ! "
-                f"videoconvert ! video/x-raw, format=BGR ! "
-                f"appsink"
+                f"video/x-raw, width={out_w}, height={out_h}, format=BGRx ! "
+                f"videoconvert ! video/x-raw, format={self.preprocessed_format} ! "
+                f"{APPSINK}"
             )
         elif self.camera_type == "ip":
             # IP camera pipeline
             pipeline = (
                 f"rtspsrc location={self.camera_id} ! "
                 f"rtph264depay ! h264parse ! avdec_h264 ! "
-                f"videoconvert ! video/x-raw, format=BGR ! "
-                f"videoscale ! video/x-raw, width={self.width}, height={self.height} ! "
-                f"appsink"
+                f"videoconvert ! videoscale ! {out_caps} ! "
+                f"{APPSINK}"
             )
         else:
             # USB camera pipeline
@@ -75,8 +165,8 @@ class GStreamerCamera:
                 f"v4l2src device=/dev/video{self.camera_id} ! "
                 f"video/x-raw, width={self.width}, height={self.height}, "
                 f"framerate={self.fps}/1, format=YUY2 ! "
-                f"videoconvert ! video/x-raw, format=BGR ! "
-                f"appsink"
+                f"videoconvert ! videoscale ! {out_caps} ! "
+                f"{APPSINK}"
             )
         
         return pipeline
@@ -139,6 +229,7 @@ class GStreamerCamera:
         
         if self.capture_thread and self.capture_thread.is_alive():
             self.capture_thread.join(timeout=2.0)
+        self.latest_frame = None
         
         if self.cap:
             self.cap.release()
@@ -147,32 +238,48 @@ class GStreamerCamera:
         logger.info("Camera streaming stopped")
     
     def _capture_frames(self):
-        """Internal frame capture loop"""
-        while self.is_streaming and self.cap:
-            try:
+        """Internal frame capture loop; exits on unexpected errors and is restarted by the CameraManager watchdog"""
+        failures = 0
+        try:
+            while self.is_streaming and self.cap:
                 ret, frame = self.cap.read()
-                if ret:
-                    with self.frame_lock:
-                        self.latest_frame = frame.copy()
-                    
-                    # Call frame processing callback if set
-                    if self.frame_callback:
-                        try:
-                            self.frame_callback(frame)
-                        except Exception as e:
-                            logger.error(f"Frame callback error: {e}")
-                else:
-                    logger.warning("Failed to read frame from camera")
+                if not ret:
+                    failures += 1
+                    logger.warning(f"Failed to read frame from camera ({failures} in a row)")
+                    if failures >= MAX_READ_FAILURES:
+                        # Let the watchdog reopen the device
+                        logger.error("Camera stopped delivering frames, ending capture thread")
+                        return
                     time.sleep(0.1)
-                    
-            except Exception as e:
-                logger.error(f"Frame capture error: {e}")
-                time.sleep(0.1)
+                    continue
+                failures = 0
+                
+                # read() hands back a freshly allocated array, so publish it
+                # as-is; get_latest_frame copies on demand for consumers.
+                # Reference stores are atomic and this is the only writer.
+                self.latest_frame = frame
+                self.frame_count += 1
+                self.frame_ready.set()
+                
+                # Call frame processing callback if set
+                if self.frame_callback:
+                    try:
+                        self.frame_callback(frame)
+                    except Exception as e:
+                        logger.error(f"Frame callback error: {e}")
+        except Exception as e:
+            if self.is_streaming:
+                logger.error(f"Frame capture thread stopped: {e}")
+    
+    def restart_streaming(self) -> bool:
+        """Tear down and reopen the capture, e.g. after the capture thread died"""
+        self.stop_streaming()
+        return self.start_streaming()
     
     def get_latest_frame(self) -> Optional[np.ndarray]:
         """Get the latest captured frame"""
-        with self.frame_lock:
-            return self.latest_frame.copy() if self.latest_frame is not None else None
+        frame = self.latest_frame
+        return frame.copy() if frame is not None else None
     
     def set_frame_callback(self, callback: Callable[[np.ndarray], None]):
         """Set callback function for frame processing"""
@@ -195,6 +302,8 @@ class GStreamerCamera:
             "camera_id": self.camera_id,
             "camera_type": self.camera_type,
             "resolution": f"{self.width}x{self.height}",
+            "output_resolution": f"{self.preprocessed_width}x{self.preprocessed_height}",
+            "output_format": self.preprocessed_format,
             "fps": self.fps,
             "is_streaming": self.is_streaming,
             "backend": "GStreamer" if self.camera_type in ["csi", "ip"] else "OpenCV"
@@ -210,24 +319,64 @@ class GStreamerCamera:
 class CameraManager:
     """Manager for multiple camera instances"""
     
+    WATCHDOG_INTERVAL = 2.0  # Seconds between capture thread health checks
+    MAX_RESTART_BACKOFF = 60.0
+    
     def __init__(self):
         self.cameras = {}
         self.active_camera_id = None
+        self.watchdog_thread = None
+        self.restart_pending = set()  # Cameras the watchdog failed to restart and will retry
+    
+    def _ensure_watchdog(self):
+        """Start the capture thread watchdog on first use"""
+        if self.watchdog_thread is None or not self.watchdog_thread.is_alive():
+            self.watchdog_thread = threading.Thread(target=self._watchdog, daemon=True)
+            self.watchdog_thread.start()
+    
+    def _watchdog(self):
+        """Restart streaming cameras whose capture thread has exited, backing off on repeated failures"""
+        backoff = {}
+        next_attempt = {}
+        while True:
+            time.sleep(self.WATCHDOG_INTERVAL)
+            now = time.monotonic()
+            for camera_id, camera in list(self.cameras.items()):
+                thread = camera.capture_thread
+                died = camera.is_streaming and thread is not None and not thread.is_alive()
+                if not died and camera_id not in self.restart_pending:
+                    backoff.pop(camera_id, None)
+                    continue
+                if now < next_attempt.get(camera_id, 0):
+                    continue
+                
+                logger.warning(f"Capture for camera {camera_id} is down, restarting")
+                if camera.restart_streaming():
+                    self.restart_pending.discard(camera_id)
+                    backoff.pop(camera_id, None)
+                else:
+                    # start_streaming leaves is_streaming False on failure, so remember to retry
+                    self.restart_pending.add(camera_id)
+                    delay = min(backoff.get(camera_id, self.WATCHDOG_INTERVAL) * 2, self.MAX_RESTART_BACKOFF)
+                    backoff[camera_id] = delay
+                    next_attempt[camera_id] = now + delay
     
     def add_camera(self, 
                    camera_id: int,
                    camera_type: str = "usb",
                    width: int = 1280,
                    height: int = 720,
-                   fps: int = 30) -> bool:
-        """Add a new camera"""
+                   fps: int = 30,
+                   **preprocessing) -> bool:
+        """Add a new camera; extra kwargs set the in-pipeline preprocessing"""
         try:
             camera = GStreamerCamera(
                 camera_id=camera_id,
                 width=width,
                 height=height,
                 fps=fps,
-                camera_type=camera_type
+                camera_type=camera_type,
+                **preprocessing
             )
             
             self.cameras[camera_id] = camera
@@ -252,19 +401,28 @@ class CameraManager:
         success = self.cameras[camera_id].start_streaming()
         if success:
             self.active_camera_id = camera_id
+            self._ensure_watchdog()
         
         return success
     
     def stop_camera(self, camera_id: int):
         """Stop streaming from a specific camera"""
+        self.restart_pending.discard(camera_id)
         if camera_id in self.cameras:
             self.cameras[camera_id].stop_streaming()
     
     def stop_all_cameras(self):
         """Stop all cameras"""
+        self.restart_pending.clear()
         for camera in self.cameras.values():
             camera.stop_streaming()
     
+    def get_active_camera(self) -> Optional[GStreamerCamera]:
+        """Get the active camera instance"""
+        if self.active_camera_id is not None:
+            return self.cameras.get(self.active_camera_id)
+        return None
+    
     def get_active_frame(self) -> Optional[np.ndarray]:
         """Get frame from active camera"""
         if self.active_camera_id and self.active_camera_id in self.cameras:
@@ -290,5 +448,146 @@ class CameraManager:
             return self.cameras[camera_id].get_camera_info()
         return None
 
+class FrameBroadcaster:
+    """Encodes each frame of the active camera once and shares it with all stream clients
+    
+    Capture, encode and per-client sends run on separate threads so a slow encode or
+    socket write never backs up the others; each stage only ever sees the newest frame.
+    """
+    
+    def __init__(self, manager: CameraManager, quality: int = 80, max_clients: int = 16,
+                 use_gpu_encoder: bool = True):
+        self.manager = manager
+        self.quality = quality
+        self.max_clients = max_clients
+        self.use_gpu_encoder = use_gpu_encoder  # Encode on nvJPEG when CUDA is present
+        
+        self.latest = None  # Most recent JPEG (immutable bytes shared by every client)
+        self.seq = 0
+        self.clients = 0
+        self.cond = threading.Condition()
+        self.producer_thread = None
+        self.encoder_thread = None
+        self.raw_frames = queue.Queue(maxsize=1)  # Capture -> encode; holds only the freshest frame
+        self.listeners = []  # Callbacks invoked with each new JPEG (async stream clients)
+    
+    def _ensure_producer(self):
+        """Start the capture and encode threads on first use"""
+        if self.producer_thread is None or not self.producer_thread.is_alive():
+            self.producer_thread = threading.Thread(target=self._capture, daemon=True)
+            self.producer_thread.start()
+        if self.encoder_thread is None or not self.encoder_thread.is_alive():
+            self.encoder_thread = threading.Thread(target=self._encode, daemon=True)
+            self.encoder_thread.start()
+    
+    @staticmethod
+    def _put_latest(q: queue.Queue, item):
+        """Put item, evicting the unconsumed one so the queue always holds the freshest frame"""
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            pass
+    
+    def _capture(self):
+        """Hand new camera frames to the encoder while at least one client is connected"""
+        last_count = -1
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.clients > 0)
+            
+            camera = self.manager.get_active_camera()
+            if camera is None:
+                time.sleep(0.1)
+                continue
+            
+            # Clear before checking so a frame landing in between still wakes the wait
+            camera.frame_ready.clear()
+            if camera.frame_count == last_count:
+                camera.frame_ready.wait(timeout=1.0)
+                continue
+            
+            last_count = camera.frame_count
+            frame = camera.get_latest_frame()
+            if frame is not None:
+                self._put_latest(self.raw_frames, frame)
+    
+    def _encode(self):
+        """Encode captured frames and publish them; runs alongside capture and client sends"""
+        while True:
+            frame = self.raw_frames.get()
+            
+            try:
+                jpeg = None
+                if self.use_gpu_encoder:
+                    jpeg = encode_jpeg_nvjpeg(frame, self.quality)
+                    # Stop retrying the GPU on every frame once it has failed or is absent
+                    self.use_gpu_encoder = jpeg is not None
+                if jpeg is None:
+                    jpeg = encode_jpeg(frame, self.quality)
+            except Exception as e:
+                logger.error(f"Frame encode error: {e}")
+                continue
+            
+            if jpeg:
+                with self.cond:
+                    self.latest = jpeg
+                    self.seq += 1
+                    self.cond.notify_all()
+                    listeners = list(self.listeners)
+                
+                for listener in listeners:
+                    try:
+                        listener(jpeg)
+                    except Exception as e:
+                        logger.error(f"Frame listener error: {e}")
+    
+    def open_client(self) -> bool:
+        """Reserve a client slot; returns False when max_clients is reached"""
+        with self.cond:
+            if self.clients >= self.max_clients:
+                return False
+            self.clients += 1
+            self.cond.notify_all()
+        self._ensure_producer()
+        return True
+    
+    def close_client(self):
+        """Release a client slot"""
+        with self.cond:
+            self.clients = max(0, self.clients - 1)
+    
+    def add_listener(self, callback):
+        """Call callback(jpeg) from the encoder thread for every new frame"""
+        with self.cond:
+            self.listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        """Stop delivering frames to callback"""
+        with self.cond:
+            if callback in self.listeners:
+                self.listeners.remove(callback)
+    
+    def frames(self):
+        """Yield each new JPEG once; the caller must hold a client slot
+        
+        When no frame arrives within a second the last JPEG is sent again, so a
+        stalled camera never parks the generator where a client disconnect goes unseen.
+        """
+        last = -1
+        while True:
+            with self.cond:
+                if self.cond.wait_for(lambda: self.seq != last, timeout=1.0):
+                    last = self.seq
+                jpeg = self.latest
+            if jpeg is not None:
+                yield jpeg
+
 # Global camera manager instance
 camera_manager = CameraManager()
+
+# Global MJPEG broadcaster for the live feed
+frame_broadcaster = FrameBroadcaster(camera_manager)
@@ -4,18 +4,154 @@ Handles SQLite database operations for reports and analytics
 """
 
 import sqlite3
+import calendar
+import copy
+import functools
 import json
 import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
+
+# orjson encodes the plankton_summary payloads (numpy counts included) in native code
+try:
+    import orjson
+    
+    def dumps_json(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+except ImportError:
+    dumps_json = json.dumps
 
 DATABASE_PATH = 'data/reports.db'
 
+# Long-lived connections keep SQLite's page cache and statement cache warm.
+# Reads go through a separate pool of read-only connections; SQLite allows a
+# single writer at a time, so only a couple of read-write connections are kept
+POOL_SIZE = 8
+WRITE_POOL_SIZE = 2
+STATEMENT_CACHE_SIZE = 256
+
+_schema_ready = False
+_fts_ready = False  # reports_fts exists (needs SQLite built with FTS5 and the trigram tokenizer)
+
+# The trigram index only answers substring searches of at least this many characters
+FTS_MIN_SEARCH_LENGTH = 3
+
+# The analytics endpoints of one dashboard view read the same recent reports;
+# share one fetch for up to RECENT_REPORTS_TTL seconds or until reports change
+RECENT_REPORTS_TTL = 5.0
+_recent_cache = None  # (fetched_at, generation, fetch limit, reports)
+_reports_generation = 0
+
+# Reports are re-read on view, export and shared links; keep the most recent
+# lookups by id, dropping an entry whenever that report is updated or deleted
+REPORT_CACHE_SIZE = 1024
+_report_cache = OrderedDict()
+_report_cache_lock = threading.Lock()
+
+# Unfiltered report total, valid while _reports_generation is unchanged and for at
+# most RECENT_REPORTS_TTL seconds, since other worker processes write without
+# bumping this process's generation
+_count_cache = None  # (counted_at, generation, count)
+
+# Dashboard aggregates are recomputed at most every AGGREGATE_CACHE_TTL seconds,
+# or sooner when a report is written
+AGGREGATE_CACHE_TTL = 30.0
+_aggregate_cache = {}  # function name -> (computed_at, generation, result)
+_cache_stats = {'hits': 0, 'misses': 0}
+
+def _connect() -> sqlite3.Connection:
+    """Open a pooled connection in autocommit mode with WAL, a 64 MB page cache and 256 MB of mmap I/O"""
+    os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
+    
+    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False, isolation_level=None,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA cache_size=-65536')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA mmap_size=268435456')  # Reads served from the page cache without read() copies
+    
+    # Create tables lazily on the first connection instead of at app startup
+    global _schema_ready
+    if not _schema_ready:
+        _create_tables(conn)
+        _schema_ready = True
+    return conn
+
+def _connect_read_only() -> sqlite3.Connection:
+    """Open a pooled read-only connection; WAL lets it read while a writer commits"""
+    if not _schema_ready:
+        # The read-write pool creates the database file and schema on first use
+        with get_connection():
+            pass
+    
+    conn = sqlite3.connect(f'file:{DATABASE_PATH}?mode=ro', uri=True, check_same_thread=False,
+                           isolation_level=None, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA cache_size=-65536')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA mmap_size=268435456')
+    return conn
+
+class _ConnectionPool:
+    """Bounded pool of long-lived connections opened on demand by `connect`"""
+    
+    def __init__(self, connect, size: int):
+        self.connect = connect
+        self.size = size
+        self.idle = queue.Queue(maxsize=size)
+        self.lock = threading.Lock()
+        self.created = 0
+    
+    @contextmanager
+    def borrow(self):
+        """Borrow a connection, opening one while the pool is below its size"""
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                can_open = self.created < self.size
+                if can_open:
+                    self.created += 1
+            if not can_open:
+                conn = self.idle.get()
+            else:
+                try:
+                    conn = self.connect()
+                except sqlite3.Error:
+                    with self.lock:
+                        self.created -= 1
+                    raise
+        
+        try:
+            yield conn
+        finally:
+            self.idle.put(conn)
+
+_write_pool = _ConnectionPool(_connect, WRITE_POOL_SIZE)
+_read_pool = _ConnectionPool(_connect_read_only, POOL_SIZE)
+
+def get_connection():
+    """Borrow a read-write connection from the pool"""
+    return _write_pool.borrow()
+
+def get_read_connection():
+    """Borrow a read-only connection from the pool, for queries that never write"""
+    return _read_pool.borrow()
+
 def init_database():
     """Initialize SQLite database with required tables"""
-    os.makedirs('data', exist_ok=True)
-    
-    conn = sqlite3.connect(DATABASE_PATH)
+    with get_connection() as conn:
+        _create_tables(conn)
+
+def _create_tables(conn: sqlite3.Connection):
+    """Create the reports and analytics tables if they do not exist"""
     cursor = conn.cursor()
     
     # Create reports table
@@ -24,6 +160,7 @@ def init_database():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             slide_name TEXT NOT NULL,
             timestamp TEXT NOT NULL,
+            timestamp_epoch INTEGER,
             location TEXT,
             user TEXT,
             microplastics_present BOOLEAN DEFAULT FALSE,
@@ -46,147 +183,383 @@ def init_database():
         )
     ''')
     
-    conn.commit()
-    conn.close()
+    _add_timestamp_epoch(cursor)
+    
+    # Indexes for the listing order, detection filters and date ranges
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reports_created_at ON reports(created_at DESC)')
+    cursor.execute('DROP INDEX IF EXISTS idx_reports_timestamp')
+    cursor.execute('DROP INDEX IF EXISTS idx_reports_mp_ts')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reports_ts_epoch ON reports(timestamp_epoch)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reports_mp_ts_epoch ON reports(microplastics_present, timestamp_epoch)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reports_mp_partial ON reports(confidence)
+        WHERE microplastics_present = 1
+    ''')
+    
+    _create_search_index(cursor)
 
-def create_report(slide_name: str, location: str, user: str, 
-                 microplastic_result: Dict, plankton_result: Dict, 
-                 image_path: str) -> int:
-    """Create a new report record"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+def _add_timestamp_epoch(cursor: sqlite3.Cursor):
+    """Add and backfill timestamp_epoch on databases created before the column existed"""
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(reports)')}
+    if 'timestamp_epoch' in columns:
+        return
+    cursor.execute('ALTER TABLE reports ADD COLUMN timestamp_epoch INTEGER')
+    cursor.execute("UPDATE reports SET timestamp_epoch = CAST(strftime('%s', timestamp) AS INTEGER)")
+
+def _create_search_index(cursor: sqlite3.Cursor):
+    """Maintain a trigram FTS5 index over the searchable text columns, if this SQLite supports it"""
+    global _fts_ready
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reports_fts'").fetchone()
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+                slide_name, location, user,
+                content='reports', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        _fts_ready = False
+        return
     
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS reports_fts_insert AFTER INSERT ON reports BEGIN
+            INSERT INTO reports_fts(rowid, slide_name, location, user)
+            VALUES (new.id, new.slide_name, new.location, new.user);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS reports_fts_delete AFTER DELETE ON reports BEGIN
+            INSERT INTO reports_fts(reports_fts, rowid, slide_name, location, user)
+            VALUES ('delete', old.id, old.slide_name, old.location, old.user);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS reports_fts_update AFTER UPDATE OF slide_name, location, user ON reports BEGIN
+            INSERT INTO reports_fts(reports_fts, rowid, slide_name, location, user)
+            VALUES ('delete', old.id, old.slide_name, old.location, old.user);
+            INSERT INTO reports_fts(rowid, slide_name, location, user)
+            VALUES (new.id, new.slide_name, new.location, new.user);
+        END
+    ''')
+    
+    # Index the reports that predate the search table
+    if not exists:
+        cursor.execute("INSERT INTO reports_fts(reports_fts) VALUES ('rebuild')")
+    _fts_ready = True
+
+_INSERT_REPORT_SQL = '''
+    INSERT INTO reports (slide_name, timestamp, timestamp_epoch, location, user, 
+                       microplastics_present, particle_count, confidence, 
+                       plankton_summary, image_path)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def _report_row(slide_name: str, location: str, user: str,
+                microplastic_result: Dict, plankton_result: Dict,
+                image_path: str) -> Tuple:
+    """Build the parameter tuple for one _INSERT_REPORT_SQL row"""
     # Extract microplastic data
     microplastics_present = microplastic_result.get('present', False)
     particle_count = microplastic_result.get('count', 0)
     confidence = microplastic_result.get('confidence', 0.0)
     
     # Extract plankton data
-    plankton_summary = json.dumps(plankton_result) if plankton_result else None
-    
-    cursor.execute('''
-        INSERT INTO reports (slide_name, timestamp, location, user, 
-                           microplastics_present, particle_count, confidence, 
-                           plankton_summary, image_path)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (slide_name, datetime.now().isoformat(), location, user,
-          microplastics_present, particle_count, confidence, 
-          plankton_summary, image_path))
-    
-    report_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    
-    return report_id
+    plankton_summary = dumps_json(plankton_result) if plankton_result else None
+    
+    # timestamp_epoch counts seconds of the same local wall-clock time as the ISO
+    # timestamp, so SQLite's 'unixepoch' modifier yields the same dates and months
+    now = datetime.now()
+    return (slide_name, now.isoformat(), calendar.timegm(now.timetuple()), location, user,
+            microplastics_present, particle_count, confidence,
+            plankton_summary, image_path)
+
+def create_report(slide_name: str, location: str, user: str, 
+                 microplastic_result: Dict, plankton_result: Dict, 
+                 image_path: str) -> int:
+    """Create a new report record"""
+    row = _report_row(slide_name, location, user, microplastic_result, plankton_result, image_path)
+    with get_connection() as conn:
+        cursor = conn.execute(_INSERT_REPORT_SQL, row)
+        
+        _reports_changed()
+        return cursor.lastrowid
+
+def create_reports_bulk(reports: List[Dict]) -> int:
+    """Insert many reports in one transaction; each dict holds create_report's keyword arguments"""
+    rows = [_report_row(**report) for report in reports]
+    if not rows:
+        return 0
+    
+    with get_connection() as conn:
+        # One commit (and one WAL sync) for the whole batch instead of one per row
+        conn.execute('BEGIN')
+        try:
+            conn.executemany(_INSERT_REPORT_SQL, rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    
+    _reports_changed()
+    return len(rows)
 
 def get_report_by_id(report_id: int) -> Optional[Dict]:
     """Get a specific report by ID"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM reports WHERE id = ?', (report_id,))
-    row = cursor.fetchone()
+    with _report_cache_lock:
+        cached = _report_cache.get(report_id)
+        if cached is not None:
+            _report_cache.move_to_end(report_id)
+            return dict(cached)
+        generation = _reports_generation
     
-    conn.close()
+    with get_read_connection() as conn:
+        row = conn.execute('SELECT * FROM reports WHERE id = ?', (report_id,)).fetchone()
     
     if row:
-        return dict(row)
+        report = dict(row)
+        with _report_cache_lock:
+            # Skip caching if a write landed while we were reading
+            if generation == _reports_generation:
+                _report_cache[report_id] = report
+                if len(_report_cache) > REPORT_CACHE_SIZE:
+                    _report_cache.popitem(last=False)
+        return dict(report)
     return None
 
 def get_recent_reports(limit: int = 50, offset: int = 0) -> List[Dict]:
     """Get recent reports with pagination"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT * FROM reports 
-        ORDER BY created_at DESC 
-        LIMIT ? OFFSET ?
-    ''', (limit, offset))
-    
-    rows = cursor.fetchall()
-    conn.close()
+    with get_read_connection() as conn:
+        rows = conn.execute('''
+            SELECT * FROM reports 
+            ORDER BY created_at DESC 
+            LIMIT ? OFFSET ?
+        ''', (limit, offset)).fetchall()
     
     return [dict(row) for row in rows]
 
-def search_reports(search_term: str = '', date_from: str = '', date_to: str = '', 
-                  limit: int = 50, offset: int = 0) -> List[Dict]:
-    """Search reports with filters"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    query = 'SELECT * FROM reports WHERE 1=1'
+def _reports_changed(report_id: Optional[int] = None):
+    """Invalidate the shared recent-reports fetch, and the cached copy of report_id, after a write"""
+    global _reports_generation
+    with _report_cache_lock:
+        _reports_generation += 1
+        if report_id is not None:
+            _report_cache.pop(report_id, None)
+
+def get_shared_recent_reports(limit: int = 50, fetch_limit: int = 100) -> List[Dict]:
+    """Recent reports from a short-lived fetch shared by all callers; treat the dicts as read-only"""
+    global _recent_cache
+    cached = _recent_cache
+    if (cached is None or cached[1] != _reports_generation or limit > cached[2]
+            or time.monotonic() - cached[0] >= RECENT_REPORTS_TTL):
+        generation = _reports_generation
+        fetched = max(limit, fetch_limit)
+        cached = (time.monotonic(), generation, fetched, get_recent_reports(fetched))
+        _recent_cache = cached
+    return cached[3][:limit]
+
+def _species_totals(conn: sqlite3.Connection, limit: Optional[int] = None) -> Dict[str, int]:
+    """Sum plankton counts per species with SQLite's JSON1, over the newest `limit` reports or all of them"""
+    source = 'reports'
+    params = ()
+    if limit is not None:
+        source = '(SELECT plankton_summary FROM reports ORDER BY created_at DESC LIMIT ?)'
+        params = (limit,)
+    
+    rows = conn.execute(f'''
+        SELECT s.key, SUM(s.value)
+        FROM {source} r,
+             json_each(CASE WHEN json_valid(r.plankton_summary) THEN r.plankton_summary ELSE '{{}}' END,
+                       '$.summary') s
+        GROUP BY s.key
+    ''', params)
+    return {species: count for species, count in rows}
+
+def get_species_distribution(limit: int = 100) -> Dict[str, int]:
+    """Total plankton counts per species over the most recent reports, parsed by SQLite's JSON1"""
+    with get_read_connection() as conn:
+        return _species_totals(conn, limit)
+
+def iter_recent_reports(limit: int = 1000, batch_size: int = 100) -> Iterator[Dict]:
+    """Yield recent reports newest first without materializing the whole result"""
+    with get_read_connection() as conn:
+        cursor = conn.execute('''
+            SELECT * FROM reports 
+            ORDER BY created_at DESC 
+            LIMIT ?
+        ''', (limit,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+
+def get_reports_count() -> int:
+    """Total number of reports, recounted after a local write or RECENT_REPORTS_TTL seconds"""
+    global _count_cache
+    cached = _count_cache
+    if (cached is None or cached[1] != _reports_generation
+            or time.monotonic() - cached[0] >= RECENT_REPORTS_TTL):
+        generation = _reports_generation
+        with get_read_connection() as conn:
+            count = conn.execute('SELECT COUNT(*) FROM reports').fetchone()[0]
+        cached = (time.monotonic(), generation, count)
+        _count_cache = cached
+    return cached[2]
+
+_SEARCH_CLAUSES = {
+    None: '',
+    'like': ' AND (slide_name LIKE ? OR location LIKE ? OR user LIKE ?)',
+    'fts': ' AND id IN (SELECT rowid FROM reports_fts WHERE reports_fts MATCH ?)',
+}
+
+# WHERE clause for each (search mode, date_from, date_to) combination, built once so
+# every call with the same filters submits identical SQL to the statement cache
+_FILTER_CLAUSES = {
+    (search_mode, has_from, has_to): 'WHERE 1=1'
+        + _SEARCH_CLAUSES[search_mode]
+        + (" AND timestamp_epoch >= CAST(strftime('%s', ?) AS INTEGER)" if has_from else '')
+        + (" AND timestamp_epoch <= CAST(strftime('%s', ?) AS INTEGER)" if has_to else '')
+    for search_mode in _SEARCH_CLAUSES for has_from in (False, True) for has_to in (False, True)
+}
+
+# Complete search_reports statement for each WHERE clause above
+_SEARCH_QUERIES = {
+    where: f'SELECT * FROM reports {where} ORDER BY created_at DESC LIMIT ? OFFSET ?'
+    for where in _FILTER_CLAUSES.values()
+}
+
+def _report_filters(search_term: str = '', date_from: str = '', date_to: str = ''):
+    """Look up the WHERE clause and build the parameters shared by search_reports and get_reports_page"""
     params = []
-    
-    if search_term:
-        query += ' AND (slide_name LIKE ? OR location LIKE ? OR user LIKE ?)'
+    search_mode = None
+    if search_term and _fts_ready and len(search_term) >= FTS_MIN_SEARCH_LENGTH:
+        # A quoted trigram phrase matches the same substrings as LIKE '%term%', from the index
+        search_mode = 'fts'
+        params.append('"' + search_term.replace('"', '""') + '"')
+    elif search_term:
+        search_mode = 'like'
         search_param = f'%{search_term}%'
         params.extend([search_param, search_param, search_param])
-    
     if date_from:
-        query += ' AND timestamp >= ?'
         params.append(date_from)
-    
     if date_to:
-        query += ' AND timestamp <= ?'
         params.append(date_to)
     
-    query += ' ORDER BY created_at DESC LIMIT ? OFFSET ?'
+    return _FILTER_CLAUSES[search_mode, bool(date_from), bool(date_to)], params
+
+def search_reports(search_term: str = '', date_from: str = '', date_to: str = '', 
+                  limit: int = 50, offset: int = 0) -> List[Dict]:
+    """Search reports with filters"""
+    where, params = _report_filters(search_term, date_from, date_to)
     params.extend([limit, offset])
     
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
+    with get_read_connection() as conn:
+        rows = conn.execute(_SEARCH_QUERIES[where], params).fetchall()
     
     return [dict(row) for row in rows]
 
+def get_reports_page(after_id: Optional[int] = None, per_page: int = 20, search_term: str = '',
+                     date_from: str = '', date_to: str = '',
+                     before_id: Optional[int] = None) -> Tuple[List[Dict], bool, bool, int]:
+    """Filtered reports older than after_id or just newer than before_id, newest first, with has_prev, has_next and the total"""
+    where, params = _report_filters(search_term, date_from, date_to)
+    
+    with get_read_connection() as conn:
+        # Keyset pagination on the id B-tree: each page costs the same however deep it is;
+        # one extra row tells whether another page follows in that direction
+        rows = None
+        if before_id is not None:
+            rows = conn.execute(f'SELECT * FROM reports {where} AND id > ? ORDER BY id ASC LIMIT ?',
+                                params + [before_id, per_page + 1]).fetchall()
+            if len(rows) > per_page:
+                has_prev, has_next = True, True
+                rows = rows[per_page - 1::-1]
+            else:
+                rows = None  # Stepped back to the newest reports; serve a full first page
+        
+        if rows is None:
+            if before_id is not None:
+                after_id = None
+            page_where, page_params = where, list(params)
+            if after_id is not None:
+                page_where += ' AND id < ?'
+                page_params.append(after_id)
+            rows = conn.execute(f'SELECT * FROM reports {page_where} ORDER BY id DESC LIMIT ?',
+                                page_params + [per_page + 1]).fetchall()
+            has_prev, has_next = after_id is not None, len(rows) > per_page
+            rows = rows[:per_page]
+        
+        # A lone first page already holds every match, so only deeper or longer listings count
+        if not has_prev and not has_next:
+            total = len(rows)
+        elif params:
+            total = conn.execute(f'SELECT COUNT(*) FROM reports {where}', params).fetchone()[0]
+        else:
+            total = None
+    
+    if total is None:
+        total = get_reports_count()
+    return [dict(row) for row in rows], has_prev, has_next, total
+
+def _ttl_cached(func):
+    """Serve func's result from _aggregate_cache until it expires or reports change"""
+    @functools.wraps(func)
+    def wrapper():
+        cached = _aggregate_cache.get(func.__name__)
+        if (cached is not None and cached[1] == _reports_generation
+                and time.monotonic() - cached[0] < AGGREGATE_CACHE_TTL):
+            _cache_stats['hits'] += 1
+            return copy.deepcopy(cached[2])
+        
+        _cache_stats['misses'] += 1
+        generation = _reports_generation
+        result = func()
+        _aggregate_cache[func.__name__] = (time.monotonic(), generation, result)
+        return copy.deepcopy(result)
+    return wrapper
+
+def get_cache_stats() -> Dict:
+    """Hit/miss counters of the aggregate cache and the size of the report cache"""
+    return {
+        'aggregate_hits': _cache_stats['hits'],
+        'aggregate_misses': _cache_stats['misses'],
+        'aggregate_entries': len(_aggregate_cache),
+        'report_cache_size': len(_report_cache)
+    }
+
+@_ttl_cached
 def get_analytics_data() -> Dict:
     """Get analytics data for dashboard"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Get total reports count
-    cursor.execute('SELECT COUNT(*) FROM reports')
-    total_reports = cursor.fetchone()[0]
-    
-    # Get microplastic detection count
-    cursor.execute('SELECT COUNT(*) FROM reports WHERE microplastics_present = 1')
-    microplastic_detections = cursor.fetchone()[0]
-    
-    # Get average confidence
-    cursor.execute('SELECT AVG(confidence) FROM reports WHERE microplastics_present = 1')
-    avg_confidence = cursor.fetchone()[0] or 0
-    
-    # Get detection rate by month
-    cursor.execute('''
-        SELECT strftime('%Y-%m', timestamp) as month, 
-               COUNT(*) as total,
-               SUM(CASE WHEN microplastics_present = 1 THEN 1 ELSE 0 END) as detections
-        FROM reports 
-        GROUP BY month 
-        ORDER BY month DESC 
-        LIMIT 12
-    ''')
-    monthly_data = cursor.fetchall()
-    
-    # Get species distribution
-    cursor.execute('SELECT plankton_summary FROM reports WHERE plankton_summary IS NOT NULL')
-    species_data = cursor.fetchall()
-    
-    species_distribution = {}
-    for row in species_data:
-        try:
-            plankton_data = json.loads(row[0])
-            if 'summary' in plankton_data:
-                for species, count in plankton_data['summary'].items():
-                    species_distribution[species] = species_distribution.get(species, 0) + count
-        except:
-            continue
-    
-    conn.close()
+    with get_read_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Total reports, microplastic detections and their average confidence in one scan
+        cursor.execute('''
+            SELECT COUNT(*),
+                   COALESCE(SUM(microplastics_present = 1), 0),
+                   COALESCE(AVG(CASE WHEN microplastics_present = 1 THEN confidence END), 0)
+            FROM reports
+        ''')
+        total_reports, microplastic_detections, avg_confidence = cursor.fetchone()
+        
+        # Get detection rate by month
+        cursor.execute('''
+            SELECT strftime('%Y-%m', timestamp_epoch, 'unixepoch') as month, 
+                   COUNT(*) as total,
+                   SUM(CASE WHEN microplastics_present = 1 THEN 1 ELSE 0 END) as detections
+            FROM reports 
+            GROUP BY month 
+            ORDER BY month DESC 
+            LIMIT 12
+        ''')
+        monthly_data = cursor.fetchall()
+        
+        # Get species distribution
+        species_distribution = _species_totals(conn)
     
     return {
         'total_reports': total_reports,
@@ -197,84 +570,64 @@ def get_analytics_data() -> Dict:
         'species_distribution': species_distribution
     }
 
+UPDATABLE_COLUMNS = frozenset({
+    'slide_name', 'location', 'user', 'microplastics_present',
+    'particle_count', 'confidence', 'plankton_summary', 'image_path'
+})
+
+@functools.lru_cache(maxsize=64)
+def _update_query(columns: Tuple[str, ...]) -> str:
+    """UPDATE statement for one combination of columns, built once"""
+    return f'UPDATE reports SET {", ".join(f"{column} = ?" for column in columns)} WHERE id = ?'
+
 def update_report(report_id: int, **kwargs) -> bool:
     """Update a report record"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Build update query dynamically
-    set_clauses = []
-    params = []
-    
-    for key, value in kwargs.items():
-        if key in ['slide_name', 'location', 'user', 'microplastics_present', 
-                  'particle_count', 'confidence', 'plankton_summary', 'image_path']:
-            set_clauses.append(f'{key} = ?')
-            params.append(value)
-    
-    if not set_clauses:
+    updates = {key: value for key, value in kwargs.items() if key in UPDATABLE_COLUMNS}
+    if not updates:
         return False
     
-    params.append(report_id)
-    query = f'UPDATE reports SET {", ".join(set_clauses)} WHERE id = ?'
-    
-    cursor.execute(query, params)
-    success = cursor.rowcount > 0
+    query = _update_query(tuple(updates))
+    params = [*updates.values(), report_id]
     
-    conn.commit()
-    conn.close()
-    
-    return success
+    with get_connection() as conn:
+        updated = conn.execute(query, params).rowcount > 0
+    _reports_changed(report_id)
+    return updated
 
 def delete_report(report_id: int) -> bool:
     """Delete a report record"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM reports WHERE id = ?', (report_id,))
-    success = cursor.rowcount > 0
-    
-    conn.commit()
-    conn.close()
-    
-    return success
+    with get_connection() as conn:
+        deleted = conn.execute('DELETE FROM reports WHERE id = ?', (report_id,)).rowcount > 0
+    _reports_changed(report_id)
+    return deleted
 
+@_ttl_cached
 def get_report_statistics() -> Dict:
     """Get comprehensive report statistics"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Basic counts
-    cursor.execute('SELECT COUNT(*) FROM reports')
-    total_reports = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM reports WHERE microplastics_present = 1')
-    microplastic_reports = cursor.fetchone()[0]
-    
-    # Confidence statistics
-    cursor.execute('''
-        SELECT MIN(confidence), MAX(confidence), AVG(confidence) 
-        FROM reports WHERE microplastics_present = 1
-    ''')
-    confidence_stats = cursor.fetchone()
-    
-    # Recent activity (last 7 days)
-    cursor.execute('''
-        SELECT COUNT(*) FROM reports 
-        WHERE created_at >= datetime('now', '-7 days')
-    ''')
-    recent_reports = cursor.fetchone()[0]
-    
-    conn.close()
+    with get_read_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Counts, confidence statistics and recent activity (last 7 days) in one scan
+        cursor.execute('''
+            SELECT COUNT(*),
+                   COALESCE(SUM(microplastics_present = 1), 0),
+                   MIN(CASE WHEN microplastics_present = 1 THEN confidence END),
+                   MAX(CASE WHEN microplastics_present = 1 THEN confidence END),
+                   AVG(CASE WHEN microplastics_present = 1 THEN confidence END),
+                   COALESCE(SUM(created_at >= datetime('now', '-7 days')), 0)
+            FROM reports
+        ''')
+        (total_reports, microplastic_reports,
+         min_confidence, max_confidence, avg_confidence, recent_reports) = cursor.fetchone()
     
     return {
         'total_reports': total_reports,
         'microplastic_reports': microplastic_reports,
         'detection_rate': (microplastic_reports / total_reports * 100) if total_reports > 0 else 0,
         'confidence_stats': {
-            'min': confidence_stats[0] or 0,
-            'max': confidence_stats[1] or 0,
-            'avg': confidence_stats[2] or 0
+            'min': min_confidence or 0,
+            'max': max_confidence or 0,
+            'avg': avg_confidence or 0
         },
         'recent_activity': recent_reports
     }
@@ -0,0 +1,26 @@
+"""
+Frame seeding for the placeholder models
+Derives a stable per-frame seed without copying the frame buffer
+"""
+
+import zlib
+import numpy as np
+
+# XXH3 hashes the whole buffer in place at memory bandwidth; without it, hash a strided sample
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Every SAMPLE_STRIDE-th pixel in each direction feeds the fallback seed; 4K frames hash ~8 KB, not ~25 MB
+SAMPLE_STRIDE = 64
+
+def frame_seed(frame: np.ndarray, salt: int = 0) -> int:
+    """Seed in [salt, salt + 1000) that is the same for identical frames, across processes"""
+    shape_digest = zlib.crc32(repr(frame.shape).encode())
+    if xxhash is not None and frame.flags.c_contiguous:
+        digest = xxhash.xxh3_64_intdigest(memoryview(frame).cast('B'), seed=shape_digest)
+    else:
+        sample = np.ascontiguousarray(frame[::SAMPLE_STRIDE, ::SAMPLE_STRIDE])
+        digest = zlib.crc32(memoryview(sample).cast('B'), shape_digest)
+    return digest % 1000 + salt
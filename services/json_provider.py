@@ -0,0 +1,33 @@
+"""
+JSON provider for Microbe Insights
+Serializes Flask responses and parses request bodies with orjson when it is installed
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class OrjsonProvider(DefaultJSONProvider):
+    """orjson-backed provider; numpy arrays/scalars serialize without conversion, datetimes as ISO 8601"""
+    
+    option = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Build the response body as bytes directly, skipping the str round trip"""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.option), mimetype=self.mimetype)
+
+def init_json_provider(app):
+    """Install OrjsonProvider on the app; keeps Flask's stdlib json provider if orjson is missing"""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
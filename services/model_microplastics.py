@@ -3,11 +3,27 @@ Microplastic detection model service
 Placeholder implementation for microplastic analysis
 """
 
+import os
+import time
 import numpy as np
 import cv2
 from typing import Dict, List
 import random
 from datetime import datetime
+from services.frame_seed import frame_seed
+
+# Set SIMULATE_DELAY=1 to mimic real model latency
+SIMULATE_DELAY = os.environ.get('SIMULATE_DELAY') == '1'
+
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# Box colours per microplastic type (BGR)
+TYPE_COLORS = {
+    'fiber': (0, 255, 0),      # Green
+    'fragment': (255, 0, 0),   # Blue
+    'pellet': (0, 0, 255),     # Red
+    'film': (255, 255, 0)      # Cyan
+}
 
 def analyze_microplastics(frame) -> Dict:
     """
@@ -25,19 +41,18 @@ def analyze_microplastics(frame) -> Dict:
         }
     """
     try:
-        # Simulate analysis delay
-        import time
-        time.sleep(0.1)
+        # Simulate analysis delay (demo only; it just blocks the worker thread)
+        if SIMULATE_DELAY:
+            time.sleep(0.1)
         
         # Generate random but realistic results
         # Set seed based on frame characteristics for consistency
-        frame_hash = hash(frame.tobytes()) % 1000
-        random.seed(frame_hash)
+        rng = random.Random(frame_seed(frame))  # private generator: safe to run concurrently
         
         # Simulate detection
-        present = random.random() > 0.3  # 70% chance of detection
-        count = random.randint(0, 25) if present else 0
-        confidence = random.uniform(0.6, 0.95) if present else random.uniform(0.1, 0.4)
+        present = rng.random() > 0.3  # 70% chance of detection
+        count = rng.randint(0, 25) if present else 0
+        confidence = rng.uniform(0.6, 0.95) if present else rng.uniform(0.1, 0.4)
         
         # Add some realism based on frame properties
         height, width = frame.shape[:2]
@@ -75,69 +90,59 @@ def detect_microplastic_types(frame) -> List[Dict]:
     try:
         # Simulate type-specific detection
         types = ['fiber', 'fragment', 'pellet', 'film']
-        detections = []
         
-        frame_hash = hash(frame.tobytes()) % 1000
-        random.seed(frame_hash + 100)
+        # Draw every type's outcome at once from a private generator
+        rng = np.random.default_rng(frame_seed(frame, salt=100))
+        picked = rng.random(len(types)) > 0.6  # 40% chance per type
+        counts = rng.integers(1, 9, size=len(types))
+        confidences = rng.uniform(0.5, 0.9, size=len(types)).round(3)
         
-        for micro_type in types:
-            if random.random() > 0.6:  # 40% chance per type
-                count = random.randint(1, 8)
-                confidence = random.uniform(0.5, 0.9)
-                
-                detections.append({
-                    'type': micro_type,
-                    'count': count,
-                    'confidence': round(confidence, 3)
-                })
-        
-        return detections
+        return [
+            {'type': micro_type, 'count': int(count), 'confidence': float(confidence)}
+            for micro_type, count, confidence in zip(np.array(types)[picked].tolist(),
+                                                     counts[picked], confidences[picked])
+        ]
         
     except Exception as e:
         return []
 
-def generate_visualization(frame, detections: List[Dict]) -> np.ndarray:
+def generate_visualization(frame, detections: List[Dict], copy: bool = True) -> np.ndarray:
     """
     Generate visualization of microplastic detections
     
     Args:
         frame: Original frame
         detections: List of detection results
+        copy: Draw on a copy; pass False to annotate frame in place when the original is not needed
     
     Returns:
         Annotated frame with bounding boxes
     """
     try:
-        vis_frame = frame.copy()
+        vis_frame = frame.copy() if copy else frame
         height, width = vis_frame.shape[:2]
         
-        # Draw bounding boxes for each detection
-        colors = {
-            'fiber': (0, 255, 0),      # Green
-            'fragment': (255, 0, 0),   # Blue
-            'pellet': (0, 0, 255),     # Red
-            'film': (255, 255, 0)      # Cyan
-        }
+        # Generate all bounding boxes in one batch of draws
+        n = len(detections)
+        rng = np.random.default_rng(frame_seed(frame, salt=300))
+        x1 = rng.integers(0, width // 2 + 1, n)
+        y1 = rng.integers(0, height // 2 + 1, n)
+        x2 = np.minimum(x1 + rng.integers(50, 151, n), width)
+        y2 = np.minimum(y1 + rng.integers(50, 151, n), height)
+        boxes = np.stack([x1, y1, x2, y2], axis=1).tolist()
         
-        for detection in detections:
+        # Draw bounding boxes for each detection
+        for detection, (bx1, by1, bx2, by2) in zip(detections, boxes):
             micro_type = detection['type']
             confidence = detection['confidence']
-            
-            # Generate random bounding box
-            x1 = random.randint(0, width//2)
-            y1 = random.randint(0, height//2)
-            x2 = min(x1 + random.randint(50, 150), width)
-            y2 = min(y1 + random.randint(50, 150), height)
-            
-            color = colors.get(micro_type, (255, 255, 255))
+            color = TYPE_COLORS.get(micro_type, (255, 255, 255))
             
             # Draw bounding box
-            cv2.rectangle(vis_frame, (x1, y1), (x2, y2), color, 2)
+            cv2.rectangle(vis_frame, (bx1, by1), (bx2, by2), color, 2)
             
             # Draw label
             label = f"{micro_type}: {confidence:.2f}"
-            cv2.putText(vis_frame, label, (x1, y1-10), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            cv2.putText(vis_frame, label, (bx1, by1-10), LABEL_FONT, 0.5, color, 2)
         
         return vis_frame
         
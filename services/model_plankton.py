@@ -3,11 +3,18 @@ Plankton classification model service
 Placeholder implementation for plankton analysis
 """
 
+import os
+import time
 import numpy as np
 import cv2
 from typing import Dict, List
+import heapq
 import random
 from datetime import datetime
+from services.frame_seed import frame_seed
+
+# Set SIMULATE_DELAY=1 to mimic real model latency
+SIMULATE_DELAY = os.environ.get('SIMULATE_DELAY') == '1'
 
 # Plankton species list
 PLANKTON_SPECIES = [
@@ -36,25 +43,24 @@ def classify_plankton(frame) -> Dict:
         }
     """
     try:
-        # Simulate analysis delay
-        import time
-        time.sleep(0.15)
+        # Simulate analysis delay (demo only; it just blocks the worker thread)
+        if SIMULATE_DELAY:
+            time.sleep(0.15)
         
         # Generate random but realistic results
-        frame_hash = hash(frame.tobytes()) % 1000
-        random.seed(frame_hash)
+        rng = random.Random(frame_seed(frame))  # private generator: safe to run concurrently
         
         # Generate summary counts
         summary = {}
         detailed = []
         
         # Select 3-6 species to detect
-        num_species = random.randint(3, 6)
-        selected_species = random.sample(PLANKTON_SPECIES, num_species)
+        num_species = rng.randint(3, 6)
+        selected_species = rng.sample(PLANKTON_SPECIES, num_species)
         
         for species in selected_species:
-            count = random.randint(5, 150)
-            confidence = random.uniform(0.6, 0.95)
+            count = rng.randint(5, 150)
+            confidence = rng.uniform(0.6, 0.95)
             
             summary[species] = count
             detailed.append({
@@ -67,7 +73,7 @@ def classify_plankton(frame) -> Dict:
         detailed.sort(key=lambda x: x["count"], reverse=True)
         
         # Generate ROI filenames
-        rois = [f"roi_{i+1}.jpg" for i in range(random.randint(1, 4))]
+        rois = [f"roi_{i+1}.jpg" for i in range(rng.randint(1, 4))]
         
         return {
             "summary": summary,
@@ -102,21 +108,19 @@ def segment_plankton(frame) -> np.ndarray:
         mask = np.zeros((height, width), dtype=np.uint8)
         
         # Generate random regions of interest
-        frame_hash = hash(frame.tobytes()) % 1000
-        random.seed(frame_hash + 200)
+        rng = np.random.default_rng(frame_seed(frame, salt=200))
         
-        num_regions = random.randint(3, 8)
+        # Draw every ellipse's parameters at once
+        num_regions = int(rng.integers(3, 9))
+        centers = rng.integers(50, [width-49, height-49], size=(num_regions, 2))
+        axes = rng.integers(20, 61, size=(num_regions, 2))
+        angles = rng.integers(0, 361, size=num_regions)
         
-        for _ in range(num_regions):
-            # Random ellipse
-            center_x = random.randint(50, width-50)
-            center_y = random.randint(50, height-50)
-            axes_x = random.randint(20, 60)
-            axes_y = random.randint(20, 60)
-            angle = random.randint(0, 360)
-            
-            cv2.ellipse(mask, (center_x, center_y), (axes_x, axes_y), 
-                       angle, 0, 360, 255, -1)
+        # Ellipses are convex, so the cheap convex fill applies; filling them as one
+        # fillPoly would apply the even-odd rule and punch holes where they overlap
+        for center, axis, angle in zip(centers.tolist(), axes.tolist(), angles.tolist()):
+            points = cv2.ellipse2Poly(tuple(center), tuple(axis), angle, 0, 360, 5)
+            cv2.fillConvexPoly(mask, points, 255)
         
         return mask
         
@@ -141,32 +145,32 @@ def generate_roi_images(frame, mask: np.ndarray, rois: List[str]) -> List[np.nda
         # Find contours in mask
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
-        # Sort contours by area
-        contours = sorted(contours, key=cv2.contourArea, reverse=True)
+        # Only the largest len(rois) contours are used, so skip sorting the rest
+        top_contours = heapq.nlargest(len(rois), contours, key=cv2.contourArea)
         
         # Extract top ROI images
-        for i, roi_name in enumerate(rois[:len(contours)]):
-            if i < len(contours):
-                # Get bounding rectangle
-                x, y, w, h = cv2.boundingRect(contours[i])
-                
-                # Add padding
-                padding = 10
-                x = max(0, x - padding)
-                y = max(0, y - padding)
-                w = min(frame.shape[1] - x, w + 2*padding)
-                h = min(frame.shape[0] - y, h + 2*padding)
-                
-                # Extract ROI
-                roi = frame[y:y+h, x:x+w]
-                roi_images.append(roi)
+        for contour in top_contours:
+            # Get bounding rectangle
+            x, y, w, h = cv2.boundingRect(contour)
+            
+            # Add padding
+            padding = 10
+            x = max(0, x - padding)
+            y = max(0, y - padding)
+            w = min(frame.shape[1] - x, w + 2*padding)
+            h = min(frame.shape[0] - y, h + 2*padding)
+            
+            # Extract ROI as its own contiguous block so encoders get a packed buffer
+            roi = np.ascontiguousarray(frame[y:y+h, x:x+w])
+            roi_images.append(roi)
         
         return roi_images
         
     except Exception as e:
         return []
 
-def create_overlay_visualization(frame, mask: np.ndarray, classification: Dict) -> np.ndarray:
+def create_overlay_visualization(frame, mask: np.ndarray, classification: Dict,
+                                 copy: bool = True) -> np.ndarray:
     """
     Create overlay visualization of plankton classification
     
@@ -174,16 +178,15 @@ def create_overlay_visualization(frame, mask: np.ndarray, classification: Dict)
         frame: Original frame
         mask: Segmentation mask
         classification: Classification results
+        copy: Blend into a new frame; pass False to blend into frame in place when the original is not needed
     
     Returns:
         Overlay visualization frame
     """
     try:
-        overlay = frame.copy()
-        
-        # Apply colored mask
+        # Apply colored mask; addWeighted writes its own output, so frame needs no copy first
         colored_mask = cv2.applyColorMap(mask, cv2.COLORMAP_JET)
-        overlay = cv2.addWeighted(overlay, 0.7, colored_mask, 0.3, 0)
+        overlay = cv2.addWeighted(frame, 0.7, colored_mask, 0.3, 0, dst=None if copy else frame)
         
         # Add text information
         if classification.get('detailed'):
@@ -0,0 +1,15 @@
+"""
+WSGI entry point for production servers
+app.py is shadowed by the app/ package on import, so it is loaded by path here
+"""
+
+import importlib.util
+import os
+
+_spec = importlib.util.spec_from_file_location(
+    'microbe_insights_app', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py'))
+_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_module)
+
+create_app = _module.create_app
+application = create_app()